@@ -0,0 +1,106 @@
+import math
+import threading
+
+
+class Histogram:
+    """
+    Histograma de valores inteiros não negativos com memória constante, no estilo HDR.
+    Valores menores que sub_buckets são guardados exatamente; acima disso cada potência
+    de 2 é dividida em sub_buckets / 2 faixas, com erro relativo de no máximo 2 / sub_buckets.
+    """
+
+    def __init__(self, sub_buckets: int = 64) -> None:
+        """Inicializa um histograma vazio. sub_buckets deve ser uma potência de 2."""
+        if sub_buckets < 2 or sub_buckets & (sub_buckets - 1) != 0:
+            raise ValueError(f"sub_buckets deve ser uma potência de 2: {sub_buckets}")
+
+        self.sub_buckets = sub_buckets
+        self.sub_bucket_bits = sub_buckets.bit_length() - 1
+        self.counts: dict[int, int] = {}  # índice do bucket -> quantidade, no máximo 64 * sub_buckets entradas
+        self.lock = threading.Lock()
+
+        # Média e variância calculadas de forma incremental (algoritmo de Welford)
+        self.count = 0
+        self.mean_value = 0.0
+        self.m2 = 0.0
+        self.min_value: int | None = None
+        self.max_value: int | None = None
+
+    def bucket_index(self, value: int) -> int:
+        """Retorna o índice do bucket onde value é registrado."""
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return (shift << (self.sub_bucket_bits - 1)) + (value >> shift)
+
+    def bucket_upper_bound(self, index: int) -> int:
+        """Retorna o maior valor que pode ser registrado no bucket de índice index."""
+        if index < self.sub_buckets:
+            return index
+        half = self.sub_buckets >> 1
+        shift = (index - half) >> (self.sub_bucket_bits - 1)
+        sub_bucket = index - (shift << (self.sub_bucket_bits - 1))
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """Registra um valor no histograma."""
+        if value < 0:
+            raise ValueError(f"Histograma aceita apenas valores não negativos: {value}")
+
+        index = self.bucket_index(value)
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+
+            self.count += 1
+            delta = value - self.mean_value
+            self.mean_value += delta / self.count
+            self.m2 += delta * (value - self.mean_value)
+
+            self.min_value = value if self.min_value is None else min(self.min_value, value)
+            self.max_value = value if self.max_value is None else max(self.max_value, value)
+
+    def mean(self) -> float:
+        """
+        Calcula a média
+        Se o histograma é vazio, retorna -1
+        """
+        return -1 if self.count == 0 else self.mean_value
+
+    def standard_deviation(self) -> float:
+        """
+        Calcula o desvio padrão amostral
+        Se count < 2, retorna -1.00
+        """
+        return -1.00 if self.count < 2 else math.sqrt(self.m2 / (self.count - 1))
+
+    def percentile(self, percentile: float) -> int:
+        """
+        Retorna o valor abaixo do qual estão percentile% dos valores registrados.
+        Se o histograma é vazio, retorna -1
+        """
+        with self.lock:
+            if self.count == 0:
+                return -1
+            rank = max(1, math.ceil(percentile / 100 * self.count))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(self.bucket_upper_bound(index), self.max_value)
+            return self.max_value
+
+    def to_dict(self, scale: float = 1) -> dict[str, float | int | None]:
+        """Retorna um resumo do histograma, com os valores divididos por scale."""
+        def scaled(value):
+            return value if value is None or value < 0 or scale == 1 else value / scale
+
+        return {
+            "count": self.count,
+            "mean": scaled(self.mean()),
+            "stddev": scaled(self.standard_deviation()),
+            "min": scaled(self.min_value),
+            "max": scaled(self.max_value),
+            "p50": scaled(self.percentile(50)),
+            "p95": scaled(self.percentile(95)),
+            "p99": scaled(self.percentile(99)),
+        }
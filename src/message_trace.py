@@ -0,0 +1,85 @@
+import time
+import struct
+import threading
+from typing import Iterator, NamedTuple
+
+
+# Cabeçalho: <MAGIC> <VERSAO> <TAMANHO_ENDERECO> <ENDERECO_DO_NO>
+MAGIC = b"P2PTRACE"
+VERSION = 1
+HEADER = struct.Struct("<BH")
+
+# Registro: <DIRECAO> <INSTANTE> <TAMANHO_PEER> <TAMANHO_DADOS> <PEER> <DADOS>
+RECORD = struct.Struct("<cdHI")
+RECEIVED = b"R"
+SENT = b"S"
+
+
+class TraceRecord(NamedTuple):
+    """Uma mensagem recebida ou enviada pelo nó."""
+
+    direction: bytes  # RECEIVED ou SENT
+    timestamp: float  # segundos desde o início do trace
+    peer: str  # ip:porta do socket usado
+    data: bytes  # bytes exatamente como recebidos ou enviados
+
+
+class TraceWriter:
+    """Grava em um arquivo binário todas as mensagens recebidas e enviadas pelo nó."""
+
+    def __init__(self, file_path: str, node_address: str) -> None:
+        """Cria o arquivo de trace e escreve o cabeçalho."""
+        self.file = open(file_path, "wb")
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+        address = node_address.encode()
+        self.file.write(MAGIC + HEADER.pack(VERSION, len(address)) + address)
+
+    def record(self, direction: bytes, peer: str, data: bytes) -> None:
+        """Grava uma mensagem recebida de peer ou enviada para peer."""
+        timestamp = time.monotonic() - self.started_at
+        peer_bytes = peer.encode()
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(RECORD.pack(direction, timestamp, len(peer_bytes), len(data)) + peer_bytes + data)
+
+    def close(self) -> None:
+        """Fecha o arquivo, gravando o que ainda está no buffer."""
+        with self.lock:
+            self.file.close()
+
+
+def read_trace(file_path: str) -> tuple[str, list[TraceRecord]]:
+    """Lê um arquivo de trace, retornando o endereço do nó que o gravou e suas mensagens."""
+    with open(file_path, "rb") as file:
+        content = file.read()
+
+    if content[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Arquivo não é um trace válido: {file_path}")
+
+    offset = len(MAGIC)
+    version, address_length = HEADER.unpack_from(content, offset)
+    if version != VERSION:
+        raise ValueError(f"Versão de trace não suportada: {version}")
+    offset += HEADER.size
+    node_address = content[offset:offset + address_length].decode()
+    offset += address_length
+
+    return node_address, list(iterate_records(content, offset))
+
+
+def iterate_records(content: bytes, offset: int) -> Iterator[TraceRecord]:
+    """Percorre os registros de content a partir de offset, ignorando um último registro incompleto."""
+    while offset + RECORD.size <= len(content):
+        direction, timestamp, peer_length, data_length = RECORD.unpack_from(content, offset)
+        offset += RECORD.size
+        if offset + peer_length + data_length > len(content):
+            return
+
+        peer = content[offset:offset + peer_length].decode()
+        offset += peer_length
+        data = content[offset:offset + data_length]
+        offset += data_length
+        yield TraceRecord(direction, timestamp, peer, data)
@@ -0,0 +1,142 @@
+import threading
+import histogram
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+# Contadores exportados, nome: (descrição, nome do rótulo)
+COUNTERS = {
+    "p2p_messages_received_total": ("Mensagens recebidas por tipo", "type"),
+    "p2p_messages_sent_total": ("Mensagens enviadas por tipo", "type"),
+    "p2p_bytes_received_total": ("Bytes recebidos por vizinho (endereço de escuta)", "peer"),
+    "p2p_bytes_sent_total": ("Bytes enviados por vizinho (endereço de escuta)", "peer"),
+    "p2p_duplicates_total": (
+        "Buscas recebidas de novo por tipo: flooding repetido (descartado), random walk que voltou, ciclo da BP",
+        "type"
+    ),
+    "p2p_ttl_expired_total": ("Mensagens descartadas por TTL igual a zero por tipo", "type"),
+    "p2p_rate_limited_total": ("Buscas descartadas por limite de taxa por tipo", "type"),
+}
+
+
+def message_type(message: str) -> str:
+    """Retorna o tipo de uma mensagem usado como rótulo, ex: HELLO, SEARCH_FL, ACK."""
+    if message[-3:] == "_OK":
+        return "ACK"
+
+    parts = message.split(" ")
+    operacao = parts[3]
+    if operacao == "SEARCH":
+        return f"SEARCH_{parts[4]}"
+    return operacao
+
+
+class Metrics:
+    """Contadores e medidas do nó, exportados no formato texto do Prometheus."""
+
+    def __init__(self) -> None:
+        """Inicializa as métricas zeradas."""
+        self.counters: dict[str, dict[str, int]] = {name: {} for name in COUNTERS}
+        self.ack_latency = histogram.Histogram()  # microssegundos
+        self.lock = threading.Lock()
+
+        # Medidas calculadas no momento da exportação, nome: (descrição, nome do rótulo, função)
+        self.gauges: dict[str, tuple[str, str | None, Callable[[], dict[str, float] | float]]] = {}
+
+    def inc(self, name: str, label: str, amount: int = 1) -> None:
+        """Incrementa o contador name com o rótulo label."""
+        with self.lock:
+            values = self.counters[name]
+            values[label] = values.get(label, 0) + amount
+
+    def record_received(self, message: str, peer: str, num_bytes: int) -> None:
+        """Registra o recebimento de uma mensagem vinda de peer."""
+        self.inc("p2p_messages_received_total", message_type(message))
+        self.inc("p2p_bytes_received_total", peer, num_bytes)
+
+    def record_sent(self, message: str, peer: str, num_bytes: int) -> None:
+        """Registra o envio de uma mensagem para peer."""
+        self.inc("p2p_messages_sent_total", message_type(message))
+        self.inc("p2p_bytes_sent_total", peer, num_bytes)
+
+    def record_ack_latency(self, seconds: float) -> None:
+        """Registra o tempo entre o envio de uma mensagem e o recebimento de sua confirmação."""
+        self.ack_latency.record(round(seconds * 1_000_000))
+
+    def register_gauge(
+            self,
+            name: str,
+            description: str,
+            label_name: str | None,
+            function: Callable[[], dict[str, float] | float]
+    ) -> None:
+        """
+        Registra uma medida calculada por function no momento da exportação.
+        Se label_name não for None, function deve retornar um dicionário rótulo: valor.
+        """
+        self.gauges[name] = (description, label_name, function)
+
+    def render(self) -> str:
+        """Retorna todas as métricas no formato texto do Prometheus."""
+        lines = []
+        with self.lock:
+            counters = {name: dict(values) for name, values in self.counters.items()}
+
+        for name, (description, label_name) in COUNTERS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for label, value in sorted(counters[name].items()):
+                lines.append(f'{name}{{{label_name}="{label}"}} {value}')
+
+        latency = self.ack_latency.to_dict(scale=1_000_000)  # segundos
+        lines.append("# HELP p2p_ack_latency_seconds Tempo ate o recebimento da confirmacao de uma mensagem")
+        lines.append("# TYPE p2p_ack_latency_seconds summary")
+        if latency["count"] > 0:
+            for quantile in ("50", "95", "99"):
+                lines.append(f'p2p_ack_latency_seconds{{quantile="0.{quantile}"}} {latency[f"p{quantile}"]}')
+            lines.append(f"p2p_ack_latency_seconds_sum {latency['mean'] * latency['count']}")
+        lines.append(f"p2p_ack_latency_seconds_count {latency['count']}")
+
+        for name, (description, label_name, function) in self.gauges.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            values = function()
+            if label_name is None:
+                lines.append(f"{name} {values}")
+                continue
+            for label, value in sorted(values.items()):
+                lines.append(f'{name}{{{label_name}="{label}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(metrics: Metrics, port: int, ip: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Inicia, em uma thread separada, um servidor HTTP que exporta as métricas em /metrics."""
+    # Importado aqui para não atrasar a inicialização dos nós que não exportam métricas
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Responde requisições GET /metrics com as métricas do nó."""
+
+        def do_GET(self) -> None:
+            """Lida com uma requisição GET."""
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            """Não imprime as requisições, para não poluir a saída do nó."""
+
+    server = ThreadingHTTPServer((ip, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,9 +1,26 @@
+import os
+import re
 import sys
+import json
+import time
+import atexit
+import argparse
 import utils
+import search
+import histogram
+import metrics
+import profiler
+import message_trace
+import replica
+import rtt
+import rewiring
+import ratelimit
+import startup
 import socket
 import threading
 import random
-from typing import Optional, Any
+import weakref
+from typing import Optional, Any, Iterable
 from enum import Enum, auto
 
 
@@ -16,6 +33,18 @@ class MessageType(Enum):
     SEARCH_DEPTH_FIRST = auto()
     VALUE = auto()
     BYE = auto()
+    REPLICA = auto()
+    PING = auto()
+    UNLINK = auto()
+
+
+# Operações opcionais que o nó entende, anunciadas no HELLO. Nós de versões anteriores não as anunciam
+# e não as recebem, já que fecham a conexão ao receber uma operação que não conhecem.
+# FRAMED não é uma operação: indica que o nó separa as mensagens recebidas por quebras de linha.
+CAPABILITIES = ("PING", "REPLICA", "FRAMED")
+
+# Delimitador das mensagens enviadas a vizinhos que anunciaram FRAMED
+MESSAGE_DELIMITER = b"\n"
 
 
 class MenuOptions(Enum):
@@ -28,6 +57,8 @@ class MenuOptions(Enum):
     SEARCH_DEPTH_FIRST = 4
     ESTATISTICAS = 5
     ALTERAR_TTL = 6
+    EXPORTAR_ESTATISTICAS = 7
+    PERFIL = 8
     SAIR = 9
 
 
@@ -39,49 +70,149 @@ class Node:
             ip: str,
             port: int,
             neighbors: Optional[list[tuple[str, int]]],
-            key_values: Optional[dict[str, str]]
+            key_values: Optional[dict[str, str]],
+            load: bool = True,
+            node_metrics: Optional[metrics.Metrics] = None
     ) -> None:
-        """Inicializa um novo nó da rede P2P."""
-        # Se os parametros não forem passados, inicializa com valores padrão
-        if neighbors is None:
-            neighbors = []
-        if key_values is None:
-            key_values = {}
+        """
+        Inicializa um novo nó da rede P2P, que já aceita conexões na porta.
+        Se load for False, vizinhos e pares chave-valor não são carregados, o que deve ser feito depois por load.
+        Se node_metrics for dado, as mensagens da inicialização, como os HELLOs aos vizinhos, já são contadas.
+        """
+        # Tempo de cada etapa da inicialização e sinal de pronto
+        self.startup = startup.StartupTimeline()
 
         print(f"Servidor criado: {ip}:{port}\n")
         self.ip = ip
         self.port = port
-        self.sequence_number = 1  # numero de sequência da mensagem
-        self.socket = Node.create_socket(ip, port)
-        self.data = key_values  # Dicionário de chave-valor
+        self.sequence_number = 1  # numero de sequência da próxima mensagem originada pelo nó
+        self.sequence_lock = threading.Lock()  # mensagens são originadas pelo menu e por threads de recebimento
+        with self.startup.phase("escuta"):
+            # Conexões recebidas antes da thread de receive_connections iniciar ficam na fila do socket
+            self.socket = self.create_socket(ip, port)
+            self.socket.listen()
+        self.data: dict[str, str] = {}  # Dicionário de chave-valor
         self.default_ttl = 100
 
-        for key, value in self.data.items():
-            print(f"Adicionando ({key}, {value}) na tabela local")
-        print()
+        # Salva mensagens que não não recebemos ACK, chave: ip:porta valor: (mensagem, instante do envio)
+        self.messages_not_confirmed: dict[str, list[tuple[str, float]]] = {}
+
+        # Métricas exportadas via HTTP e perfil de desempenho, None enquanto desabilitados
+        self.metrics: metrics.Metrics | None = node_metrics
+        self.profiler: profiler.Profiler | None = None
 
-        # Salva mensagens que não não recebemos ACK, chave: ip:porta valor: mensagens
-        self.messages_not_confirmed: dict[str, list[str]] = {}
+        # Gravação das mensagens recebidas e enviadas, None enquanto desabilitada
+        self.trace: message_trace.TraceWriter | None = None
+
+        # Réplicas de chaves encontradas por buscas, None enquanto a replicação está desabilitada
+        self.replicas: replica.ReplicaCache | None = None
+
+        # Heartbeats enviados desde a última confirmação de cada vizinho, chave: (ip, porta)
+        self.missed_heartbeats: dict[tuple[str, int], int] = {}
+
+        # RTT suavizado de cada vizinho, medido pelas confirmações recebidas
+        self.rtts = rtt.RttTable()
+        self.rtt_forwarding = False  # Se True, buscas RW e BP preferem vizinhos com menor RTT
 
         # Salva o último número de sequência recebido de cada vizinho, chave: ip:porta valor: número de sequência
         self.last_seen_messages: dict[str, int] = {}
 
         # Salva os sockets dos vizinhos, chave: (ip, porta) valor: socket
-        self.neighbors: dict[tuple[str, int], socket.socket] = self.connect_to_neighbors(neighbors)
-
-        # Salva valores para busca em profundidade
-        self.info_busca_em_profundidade: dict[str, Any] = {
-            "no_mae": None,  # ip porta
-            "vizinho_ativo": None,  # socket
-            "vizinhos_candidatos": []  # sockets
-        }
-        # Armazena número de mensagens vistas e hop_count até encontrar chave
+        self.neighbors: dict[tuple[str, int], socket.socket] = {}
+        # Vizinhos são adicionados ao mesmo tempo pelo carregamento, por HELLOs recebidos e pela reorganização
+        self.neighbors_lock = threading.Lock()
+        # Sinaliza que os vizinhos iniciais foram conectados; até lá, mensagens recebidas são confirmadas e esperam
+        self.neighbors_loaded = threading.Event()
+        # Trava de envio de cada socket: menu, heartbeats e threads de recebimento enviam pelos mesmos sockets
+        self.send_locks: weakref.WeakKeyDictionary[socket.socket, threading.Lock] = weakref.WeakKeyDictionary()
+        self.send_locks_lock = threading.Lock()
+
+        # Operações opcionais anunciadas por cada vizinho no HELLO, chave: (ip, porta)
+        self.neighbor_capabilities: dict[tuple[str, int], frozenset[str]] = {}
+
+        # Salva valores de cada busca em profundidade que passou pelo nó, chave: (origem, seqno)
+        self.depth_first_searches = search.DepthFirstSearches()
+        # Armazena número de mensagens vistas, hop_count e latência (em microssegundos) até encontrar chave
         self.num_messages_seen_flooding = 0
         self.num_messages_seen_random_walk = 0
         self.num_messages_seen_depth_first = 0
-        self.hop_count_flooding: list[int] = []
-        self.hop_count_random_walk: list[int] = []
-        self.hop_count_depth_first: list[int] = []
+        self.hop_count_flooding = histogram.Histogram()
+        self.hop_count_random_walk = histogram.Histogram()
+        self.hop_count_depth_first = histogram.Histogram()
+        self.latency_flooding = histogram.Histogram()
+        self.latency_random_walk = histogram.Histogram()
+        self.latency_depth_first = histogram.Histogram()
+
+        # Buscas iniciadas por este nó
+        self.search_sessions = search.SearchSessions()
+
+        # Limites de taxa das buscas de outros nós encaminhadas por este nó, None enquanto desabilitados
+        self.rate_limits: ratelimit.ForwardingLimits | None = None
+
+        # Reorganização dos vizinhos em segundo plano, None enquanto desabilitada
+        self.rewiring: rewiring.Rewiring | None = None
+
+        # TTL das buscas aprendido com os saltos das buscas anteriores, None enquanto desabilitado
+        self.adaptive_ttl: search.AdaptiveTtl | None = None
+
+        if load:
+            self.load(neighbors, key_values)
+
+    def load(
+            self,
+            neighbors: Optional[list[tuple[str, int]]],
+            key_values: Optional[dict[str, str] | Iterable[tuple[str, str]]],
+            background: bool = False
+    ) -> None:
+        """
+        Carrega os pares chave-valor e conecta-se aos vizinhos, sinalizando que o nó está pronto ao terminar.
+        Se background, as duas etapas executam em paralelo e os pares não são impressos um a um;
+        buscas recebidas durante o carregamento já são respondidas para as chaves carregadas.
+        """
+        if background:
+            connector = threading.Thread(target=self.load_neighbors, args=(neighbors,), daemon=True)
+            connector.start()
+            self.load_key_values(key_values, verbose=False)
+            connector.join()
+        else:
+            self.load_key_values(key_values, verbose=True)
+            self.load_neighbors(neighbors)
+
+        self.startup.mark_ready()
+        print(self.startup.summary())
+
+    def load_key_values(self, key_values: Optional[dict[str, str] | Iterable[tuple[str, str]]], verbose: bool) -> None:
+        """Adiciona pares chave-valor na tabela local, um a um, para que já possam ser encontrados por buscas."""
+        if key_values is None:
+            key_values = {}
+        pairs = key_values.items() if isinstance(key_values, dict) else key_values
+
+        with self.startup.phase("chaves"):
+            for key, value in pairs:
+                self.data[key] = value
+                if verbose:
+                    print(f"Adicionando ({key}, {value}) na tabela local")
+        if verbose:
+            print()
+        else:
+            print(f"{len(self.data)} pares chave-valor carregados na tabela local")
+        self.startup.count("chaves", len(self.data))
+
+    def load_neighbors(self, neighbors: Optional[list[tuple[str, int]]]) -> None:
+        """Conecta-se aos vizinhos iniciais do nó e libera o processamento das mensagens recebidas."""
+        with self.startup.phase("vizinhos"):
+            self.connect_to_neighbors(neighbors or [])
+        self.startup.count("vizinhos", len(self.neighbors))
+        self.neighbors_loaded.set()
+
+    def enable_ready_file(self, file_path: str) -> None:
+        """Grava em file_path, quando o nó ficar pronto, o tempo de cada etapa da inicialização em JSON."""
+        def write(timeline: startup.StartupTimeline) -> None:
+            # Renomeado ao final, para que quem espera pelo arquivo nunca o leia pela metade
+            with open(f"{file_path}.tmp", "w") as file:
+                json.dump(timeline.to_dict(), file, indent=2)
+            os.replace(f"{file_path}.tmp", file_path)
+        self.startup.on_ready(write)
 
     @staticmethod
     def create_socket(ip: str, port: int) -> socket.socket:
@@ -90,65 +221,405 @@ class Node:
         sock.bind((ip, port))
         return sock
 
+    @staticmethod
+    def open_connection(ip: str, port: int, timeout: Optional[float] = None) -> socket.socket:
+        """Abre uma conexão TCP com outro nó. Se timeout for dado, ele vale apenas para o connect."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect((ip, port))
+        sock.settimeout(None)  # Reseta o timeout para não interferir com o resto
+        return sock
+
     def show_node(self) -> None:
         """Mostra as informações do nó."""
         print(f"IP: {self.ip}")
         print(f"Porta: {self.port}")
         self.show_neighbors()
         print("Chave_valor:")
-        for key, value in self.data.items():
+        # Cópia, pois a tabela pode estar sendo carregada em segundo plano
+        for key, value in list(self.data.items()):
             print(f"    {key}: {value}")
 
     def show_neighbors(self) -> None:
         """Mostra os vizinhos do nó."""
         print(f"Há {len(self.neighbors)} vizinhos na tabela")
         for idx, (ip, port) in enumerate(self.neighbors.keys()):
-            print(f"    [{idx}] {ip}:{port}")
+            rtt = self.neighbor_rtt(ip, port)
+            print(f"    [{idx}] {ip}:{port}" + ("" if rtt is None else f" (RTT {rtt * 1000:.2f} ms)"))
+
+    def neighbor_rtt(self, ip: str, port: int) -> float | None:
+        """Retorna o RTT suavizado, em segundos, medido pelas confirmações do vizinho."""
+        return self.rtts.srtt((ip, port))
+
+    def choose_neighbor(self, candidates: list[socket.socket]) -> socket.socket:
+        """Escolhe o vizinho para onde encaminhar uma busca, ao acaso ou ponderado pelo RTT se habilitado."""
+        if not self.rtt_forwarding:
+            return random.choice(candidates)
+        addresses = {neighbor: address for address, neighbor in list(self.neighbors.items())}
+        return self.rtts.choose(candidates, [addresses.get(candidate) for candidate in candidates])
+
+    def search_histograms(self) -> dict[str, tuple[str, histogram.Histogram, histogram.Histogram]]:
+        """Retorna, para cada modo de busca, seu nome e os histogramas de hop_count e latência."""
+        return {
+            "FL": ("flooding", self.hop_count_flooding, self.latency_flooding),
+            "RW": ("random walk", self.hop_count_random_walk, self.latency_random_walk),
+            "BP": ("busca em profundidade", self.hop_count_depth_first, self.latency_depth_first),
+        }
 
     def show_statistics(self) -> None:
-        """Imprime média e desvio padrão do hop_count de todas mensagens de busca vistas pelo nó"""
+        """Imprime média, desvio padrão e percentis do hop_count e da latência das buscas do nó"""
         print(f"Total de mensagens de flooding vistas: {self.num_messages_seen_flooding}")
         print(f"Total de mensagens de random walk vistas: {self.num_messages_seen_random_walk}")
         print(f"Total de mensagens de busca em profundidade vistas: {self.num_messages_seen_depth_first}")
         print(
             f"Media de saltos ate encontrar destino por flooding: "
-            f"{utils.calculate_mean(self.hop_count_flooding)}"
-            f" (dp {utils.calculate_standard_deviation(self.hop_count_flooding)})")
+            f"{self.hop_count_flooding.mean()}"
+            f" (dp {self.hop_count_flooding.standard_deviation()})")
         print(
             f"Media de saltos ate encontrar destino por random walk: "
-            f"{utils.calculate_mean(self.hop_count_random_walk)} "
-            f"(dp {utils.calculate_standard_deviation(self.hop_count_random_walk)})")
+            f"{self.hop_count_random_walk.mean()} "
+            f"(dp {self.hop_count_random_walk.standard_deviation()})")
         print(
             f"Media de saltos ate encontrar destino por busca em profundidade:"
-            f" {utils.calculate_mean(self.hop_count_depth_first)} "
-            f"(dp {utils.calculate_standard_deviation(self.hop_count_depth_first)})")
+            f" {self.hop_count_depth_first.mean()} "
+            f"(dp {self.hop_count_depth_first.standard_deviation()})")
+
+        for name, hop_counts, latencies in self.search_histograms().values():
+            hops = hop_counts.to_dict()
+            latency = latencies.to_dict(scale=1000)  # microssegundos -> milissegundos
+            print(
+                f"Percentis de saltos por {name}: "
+                f"p50 {hops['p50']} p95 {hops['p95']} p99 {hops['p99']}")
+            print(
+                f"Latencia ate a primeira resposta por {name} (ms): "
+                f"media {latency['mean']} p50 {latency['p50']} p95 {latency['p95']} p99 {latency['p99']}")
+
+        print(f"Inicializacao: {self.startup.summary() if self.startup.ready.is_set() else 'carregando'}")
+        print(f"Buscas sem resposta: {len(self.search_sessions.outstanding())}")
+        print(f"Respostas duplicadas descartadas: {self.search_sessions.duplicate_responses()}")
+        if self.replicas is not None:
+            replicas = self.replicas.to_dict()
+            print(
+                f"Replicas: {replicas['size']}/{replicas['max_entries']} "
+                f"(acertos {replicas['hits']}, falhas {replicas['misses']}, descartes {replicas['evictions']}, "
+                f"expiradas {replicas['expired']})")
+
+        if self.adaptive_ttl is not None:
+            for mode, adaptive in self.adaptive_ttl.to_dict(self.default_ttl).items():
+                print(
+                    f"TTL adaptativo {mode}: {adaptive['ttl']} ({adaptive['samples']} amostras, "
+                    f"{adaptive['retries']} repeticoes, {adaptive['exhausted']} sem resposta com o TTL padrao)")
+
+        if self.rate_limits is not None:
+            limits = self.rate_limits.to_dict()
+            print(f"Buscas descartadas por limite de taxa: {self.rate_limits.dropped()}")
+            for message_type, drops in sorted(limits["drops_by_type"].items()):
+                print(f"    {message_type}: {drops}")
+            for name, limiter in (("origem", limits["origin"]), ("vizinho", limits["neighbor"])):
+                if limiter is None:
+                    continue
+                for address, drops in sorted(limiter["drops"].items(), key=lambda item: item[1], reverse=True):
+                    print(f"    por {name} {address}: {drops}")
+                if limiter["overflow_drops"]:
+                    print(f"    por {name} sem balde proprio: {limiter['overflow_drops']}")
+
+        if self.rewiring is not None:
+            rewired = self.rewiring.to_dict()
+            print(
+                f"Reorganizacao: {len(self.neighbors)} vizinhos (alvo {rewired['target_degree']}, "
+                f"maximo {rewired['max_neighbors']}), {rewired['known_peers']} pares conhecidos, "
+                f"{rewired['added']} atalhos, {rewired['dropped']} removidos, {rewired['rejected']} recusados")
+
+        encaminhamento = "ponderado pelo RTT" if self.rtt_forwarding else "aleatorio"
+        print(f"Encaminhamento de buscas RW e BP: {encaminhamento}")
+        for address, estimate in self.rtts.to_dict().items():
+            print(
+                f"RTT de {address} (ms): suavizado {estimate['srtt_ms']:.3f} "
+                f"variacao {estimate['rttvar_ms']:.3f} ultimo {estimate['last_ms']:.3f} "
+                f"({estimate['samples']} amostras)")
+
+    def statistics_snapshot(self) -> dict[str, Any]:
+        """Retorna as estatísticas do nó em um formato serializável em JSON."""
+        searches = {}
+        for mode, (name, hop_counts, latencies) in self.search_histograms().items():
+            searches[mode] = {
+                "name": name,
+                "hop_count": hop_counts.to_dict(),
+                "latency_ms": latencies.to_dict(scale=1000),
+            }
+
+        return {
+            "node": f"{self.ip}:{self.port}",
+            "messages_seen": {
+                "FL": self.num_messages_seen_flooding,
+                "RW": self.num_messages_seen_random_walk,
+                "BP": self.num_messages_seen_depth_first,
+            },
+            "searches": searches,
+            "outstanding_searches": len(self.search_sessions.outstanding()),
+            "duplicate_responses": self.search_sessions.duplicate_responses(),
+            "replicas": None if self.replicas is None else self.replicas.to_dict(),
+            "default_ttl": self.default_ttl,
+            "adaptive_ttl": None if self.adaptive_ttl is None else self.adaptive_ttl.to_dict(self.default_ttl),
+            "startup": self.startup.to_dict(),
+            "rate_limits": None if self.rate_limits is None else self.rate_limits.to_dict(),
+            "rtt_forwarding": self.rtt_forwarding,
+            "rewiring": None if self.rewiring is None else self.rewiring.to_dict(),
+            "neighbor_rtt": self.rtts.to_dict(),
+        }
+
+    def enable_metrics(self, port: int) -> None:
+        """
+        Habilita a coleta de métricas e as exporta em http://127.0.0.1:<port>/metrics.
+        As métricas passadas ao criar o nó são reaproveitadas.
+        """
+        if self.metrics is None:
+            self.metrics = metrics.Metrics()
+        self.metrics.register_gauge(
+            "p2p_unconfirmed_messages",
+            "Mensagens aguardando confirmacao por vizinho",
+            "peer",
+            lambda: {peer: len(messages) for peer, messages in list(self.messages_not_confirmed.items())}
+        )
+        self.metrics.register_gauge("p2p_neighbors", "Vizinhos na tabela", None, lambda: len(self.neighbors))
+        self.metrics.register_gauge("p2p_keys", "Pares chave-valor na tabela local", None, lambda: len(self.data))
+        self.metrics.register_gauge(
+            "p2p_ready",
+            "1 depois que as chaves e os vizinhos iniciais foram carregados",
+            None,
+            lambda: int(self.startup.ready.is_set())
+        )
+        self.metrics.register_gauge(
+            "p2p_neighbor_rtt_seconds",
+            "RTT suavizado das confirmacoes por vizinho",
+            "peer",
+            lambda: {f"{ip}:{port}": srtt for (ip, port), srtt in self.rtts.srtts().items()}
+        )
+        self.metrics.register_gauge("p2p_threads_active", "Threads ativas", None, threading.active_count)
+        metrics.start_http_server(self.metrics, port)
+        print(f"Metricas disponiveis em http://127.0.0.1:{port}/metrics")
+
+    def enable_profiler(self, use_cprofile: bool = False) -> None:
+        """Habilita a medição do tempo de cada etapa do processamento de mensagens."""
+        self.profiler = profiler.Profiler(use_cprofile)
+        print(f"Perfil de desempenho habilitado{' (com cProfile)' if use_cprofile else ''}")
+
+    def profile_stage(self, stage: str) -> Any:
+        """Retorna um medidor da etapa stage para uso com with, ou um contexto vazio se o perfil está desabilitado."""
+        return profiler.DISABLED if self.profiler is None else self.profiler.stage(stage)
+
+    def show_profile(self) -> None:
+        """Imprime o tempo de cada etapa por tipo de mensagem e salva os relatórios do perfil."""
+        print("Tipo Etapa Quantidade Media(us) p99(us) Total(ms)")
+        for message_type, stage, count, mean, p99, total in self.profiler.summary():
+            print(f"    {message_type} {stage} {count} {mean:.1f} {p99} {total:.3f}")
+
+        folded_path = f"perfil_{self.port}.folded"
+        self.profiler.dump_folded(folded_path)
+        print(f"Pilhas para flamegraph salvas em {folded_path}")
+
+        cprofile_path = f"perfil_{self.port}.prof"
+        if self.profiler.dump_cprofile(cprofile_path):
+            print(f"Estatisticas do cProfile salvas em {cprofile_path}")
+        if self.profiler.cprofile_skipped:
+            print(f"Mensagens sem cProfile (outra thread era perfilada): {self.profiler.cprofile_skipped}")
+
+    def enable_rate_limits(self, origin_rate: float | None, neighbor_rate: float | None, burst: float) -> None:
+        """
+        Habilita os limites de taxa: buscas de outros nós só são encaminhadas enquanto sua origem não exceder
+        origin_rate mensagens por segundo e o vizinho que as entregou não exceder neighbor_rate, com rajadas
+        de até burst mensagens. As demais são descartadas; respostas VALUE e confirmações nunca são limitadas.
+        """
+        self.rate_limits = ratelimit.ForwardingLimits(origin_rate, neighbor_rate, burst)
+        print(f"Limites de taxa habilitados: {origin_rate} msg/s por origem, {neighbor_rate} msg/s por vizinho")
+
+    def within_rate_limit(self, message_type: str, origin: str, neighbor: str) -> bool:
+        """Verifica se uma busca recebida de neighbor pode ser encaminhada, contando-a se for descartada."""
+        if self.rate_limits is None or self.rate_limits.allow(message_type, origin, neighbor):
+            return True
+
+        print(f"Limite de taxa excedido (origem {origin}, vizinho {neighbor}), descartando mensagem")
+        if self.metrics is not None:
+            self.metrics.inc("p2p_rate_limited_total", message_type)
+        return False
+
+    def enable_rewiring(self, target_degree: int, max_neighbors: int, interval: float) -> None:
+        """
+        Habilita a reorganização dos vizinhos: a cada interval segundos o nó anuncia seus vizinhos em HELLOs
+        e adiciona um atalho ou remove uma ligação redundante em direção a target_degree vizinhos.
+        Pedidos de novos vizinhos são recusados acima de max_neighbors.
+        """
+        self.rewiring = rewiring.Rewiring(target_degree, max_neighbors, interval)
+        threading.Thread(target=self.rewire, daemon=True).start()
+        print(f"Reorganizacao habilitada: grau alvo {target_degree}, maximo de {max_neighbors} vizinhos")
+
+    def rewire(self) -> None:
+        """Periodicamente anuncia os vizinhos e adiciona um atalho ou remove uma ligação redundante."""
+        own_address = (self.ip, self.port)
+        while True:
+            time.sleep(self.rewiring.interval)
+            for neighbor in list(self.neighbors.values()):
+                try:
+                    self.send_hello(neighbor)
+                except OSError:
+                    pass  # Vizinho removido enquanto a lista era anunciada
+
+            shortcut = self.rewiring.shortcut(own_address, list(self.neighbors))
+            if shortcut is not None:
+                print(f"Reorganizacao: adicionando atalho para {shortcut[0]}:{shortcut[1]}")
+                self.connect_to_neighbors([shortcut])
+                if shortcut in self.neighbors:
+                    self.rewiring.added += 1
+                else:
+                    self.rewiring.forget(shortcut)
+
+            # A ligação só é fechada pelo vizinho, depois de confirmar que este nó continua alcançável sem ela
+            redundant = self.rewiring.redundant_link(list(self.neighbors))
+            if redundant is not None and self.supports(redundant, "UNLINK") and self.rewiring.request_unlink(redundant):
+                print(f"Reorganizacao: pedindo a remocao da ligacao redundante com {redundant[0]}:{redundant[1]}")
+                try:
+                    self.send_unlink(self.neighbors[redundant])
+                except (OSError, KeyError):
+                    pass  # Vizinho removido enquanto a ligação era escolhida
+
+    def reject_neighbor(self, ip: str, port: int) -> None:
+        """Recusa um novo vizinho quando o nó já tem o máximo de vizinhos, respondendo com um BYE."""
+        print(f"Maximo de vizinhos atingido, recusando {ip}:{port}")
+        try:
+            sock = self.open_connection(ip, port, timeout=0.5)
+            self.send_bye(sock)
+            sock.close()
+        except OSError:
+            print("    Erro ao conectar!")
+        self.rewiring.rejected += 1
+
+    def enable_adaptive_ttl(self, percentile: float, margin: int, timeout: float, max_retries: int = 2) -> None:
+        """
+        Habilita o TTL adaptativo: buscas iniciadas pelo nó usam o percentil dado dos saltos das últimas
+        buscas bem-sucedidas do mesmo modo mais margin, e são repetidas com o dobro do TTL após timeout
+        segundos sem resposta, até max_retries vezes.
+        """
+        self.adaptive_ttl = search.AdaptiveTtl(percentile, margin, timeout, max_retries)
+        print(f"TTL adaptativo habilitado: p{percentile:g} dos saltos + {margin}, "
+              f"repetindo ate {max_retries} vezes apos {timeout}s")
+
+    def enable_rtt_forwarding(self) -> None:
+        """Faz buscas por random walk e em profundidade escolherem vizinhos com probabilidade inversa ao RTT."""
+        self.rtt_forwarding = True
+        print("Encaminhamento ponderado pelo RTT dos vizinhos habilitado")
+
+    def enable_heartbeats(self, interval: float, max_misses: int) -> None:
+        """Habilita o envio de heartbeats a cada interval segundos, removendo vizinhos que perderem max_misses."""
+        threading.Thread(target=self.send_heartbeats, args=(interval, max_misses), daemon=True).start()
+        print(f"Heartbeats habilitados a cada {interval}s, removendo vizinhos apos {max_misses} sem resposta")
+
+    def send_heartbeats(self, interval: float, max_misses: int) -> None:
+        """Envia heartbeats periodicamente e remove vizinhos que não confirmaram os últimos max_misses."""
+        while True:
+            time.sleep(interval)
+            for (ip, port), neighbor in list(self.neighbors.items()):
+                if not self.supports((ip, port), "PING"):
+                    continue  # Vizinho de uma versão sem heartbeats, ou que ainda não respondeu o HELLO
+
+                missed = self.missed_heartbeats.get((ip, port), 0)
+                if missed >= max_misses:
+                    print(f"Vizinho {ip}:{port} sem resposta a {missed} heartbeats")
+                    self.delete_neighbor(ip, port)
+                    continue
+
+                try:
+                    self.missed_heartbeats[(ip, port)] = missed + 1
+                    self.send_heartbeat(neighbor)
+                except OSError:
+                    print(f"Erro ao enviar heartbeat para {ip}:{port}")
+                    self.delete_neighbor(ip, port)
+
+    def enable_replication(self, max_entries: int, ttl: float = 60.0) -> None:
+        """
+        Habilita a replicação: valores encontrados por buscas iniciadas pelo nó são guardados
+        e enviados aos vizinhos, e réplicas recebidas respondem buscas como a tabela local por até ttl segundos.
+        """
+        self.replicas = replica.ReplicaCache(max_entries, ttl)
+        print(f"Replicacao habilitada, guardando ate {max_entries} replicas por {ttl:g}s")
+
+    def lookup_value(self, key: str) -> str | None:
+        """Retorna o valor de key na tabela local ou, se habilitado, no cache de réplicas."""
+        if key in self.data:
+            return self.data[key]
+        if self.replicas is None:
+            return None
+
+        value = self.replicas.get(key)
+        if value is not None:
+            print(f"Chave {key} encontrada no cache de replicas")
+        return value
+
+    def enable_trace(self, file_path: str) -> None:
+        """Habilita a gravação das mensagens recebidas e enviadas em file_path, para uso com replay.py."""
+        self.trace = message_trace.TraceWriter(file_path, f"{self.ip}:{self.port}")
+        atexit.register(self.trace.close)
+        print(f"Gravando mensagens em {file_path}")
 
     def receive_connections(self) -> None:
         """Recebe conexões de outros nós e inicia uma thread para lidar com a conexão."""
-        self.socket.listen()
         while True:
             connection, _ = self.socket.accept()
+            self.startup.mark("primeira_conexao")
             threading.Thread(target=self.receive_message, args=(connection,), daemon=True).start()
 
     def connect_to_neighbors(self, neighbors: list[tuple[str, int]]) -> dict[tuple[str, int], socket.socket]:
-        """Conecta-se aos vizinhos do nó."""
-        all_neighbors = {}
-        for neighbor in neighbors:
-            ip, port = neighbor
-            print(f"Tentando adicionar vizinho {ip}:{port}")
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        """Conecta-se em paralelo aos vizinhos do nó, adicionando-os à tabela. Retorna os vizinhos adicionados."""
+        added_neighbors = {}
+
+        def connect(ip: str, port: int) -> None:
+            sock = self.connect_to_neighbor(ip, port)
+            if sock is not None:
+                added_neighbors[(ip, port)] = sock
+
+        threads = [threading.Thread(target=connect, args=neighbor, daemon=True) for neighbor in neighbors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return added_neighbors
+
+    def connect_to_neighbor(self, ip: str, port: int) -> socket.socket | None:
+        """Conecta-se a um vizinho e envia um HELLO. Retorna o socket, ou None se o vizinho não foi adicionado."""
+        print(f"Tentando adicionar vizinho {ip}:{port}")
+        try:
+            # Se socket não conectar em 0.5, provavelmente não esta online
+            sock = self.open_connection(ip, port, timeout=0.5)
+        except OSError:
+            print(f"    Erro ao conectar com {ip}:{port}!")
+            return None
 
-                sock.settimeout(0.5)  # Se socket não conectar em 0.5, provavelmente não esta online
-                sock.connect((ip, port))
-                sock.settimeout(None)  # Reseta o timeout para não interferir com o resto
-                self.send_hello(sock)
-                all_neighbors[neighbor] = sock
+        if not self.store_neighbor(ip, port, sock):
+            print(f"    Vizinho já está na tabela {ip}:{port}")
+            return None
+        try:
+            self.send_hello(sock)
+        except OSError:
+            print(f"    Erro ao enviar HELLO para {ip}:{port}!")
+            self.delete_neighbor(ip, port)
+            return None
+        return sock
 
-                threading.Thread(target=self.receive_message, args=(sock,), daemon=True).start()
-            except (ConnectionRefusedError, TimeoutError):
-                print("    Erro ao conectar!")
-        return all_neighbors
+    def store_neighbor(self, ip: str, port: int, sock: socket.socket) -> bool:
+        """
+        Guarda o socket de um vizinho na tabela e começa a receber suas mensagens. Se o vizinho já foi adicionado
+        por outra thread, ex: por um HELLO recebido enquanto este nó se conectava, o socket é fechado.
+        Retorna se o socket foi guardado.
+        """
+        with self.neighbors_lock:
+            stored = (ip, port) not in self.neighbors
+            if stored:
+                self.neighbors[(ip, port)] = sock
+
+        if not stored:
+            sock.close()
+            return False
+        threading.Thread(target=self.receive_message, args=(sock,), daemon=True).start()
+        return True
 
     def add_neighbor(self, ip: str, port: int) -> None:
         """Adiciona um vizinho ao nó."""
@@ -159,36 +630,52 @@ class Node:
         print(f"Tentando conectar com {ip}:{port}")
 
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((ip, port))
-            self.neighbors[(ip, port)] = sock
-            print(f"    Adicionando vizinho na tabela: {ip}:{port}")
-            threading.Thread(target=self.receive_message, args=(sock,), daemon=True).start()
-        except ConnectionRefusedError:
+            sock = self.open_connection(ip, port)
+        except OSError:
             print("    Erro ao conectar!")
+            return
+        if self.store_neighbor(ip, port, sock):
+            print(f"    Adicionando vizinho na tabela: {ip}:{port}")
+        else:
+            print(f"Vizinho já está na tabela {ip}:{port}")
 
     def delete_neighbor(self, ip: str, port: int) -> None:
         """Deleta um vizinho do nó."""
-        if (ip, port) not in self.neighbors:
+        with self.neighbors_lock:
+            sock = self.neighbors.pop((ip, port), None)
+        if sock is None:
             print(f"Vizinho não está na tabela {ip}:{port}")
             return
 
         # Fecha a conexão com o vizinho
-        self.neighbors[(ip, port)].close()
-        del self.neighbors[(ip, port)]
+        sock.close()
         print(f"Removendo vizinho da tabela {ip}:{port}")
 
         # Remove o vizinho da lista de mensagens vistas
         if f"{ip}:{port}" in self.last_seen_messages:
             del self.last_seen_messages[f"{ip}:{port}"]
 
+        # Descarta o que era medido sobre o vizinho, uma nova conexão começa do zero
+        self.messages_not_confirmed.pop(f"{ip}:{port}", None)
+        self.missed_heartbeats.pop((ip, port), None)
+        self.neighbor_capabilities.pop((ip, port), None)
+        self.rtts.remove((ip, port))
+        if self.rewiring is not None:
+            self.rewiring.forget((ip, port))
+
     def mark_message_as_seen(self, message: str) -> None:
-        """Marca uma mensagem como vista."""
+        """Marca uma busca como vista."""
         parts = message.split(" ")
         origin = parts[0]
         sequence_number = parts[1]
-        # Não marca mensagens de confirmação ou mensagens já vistas
-        if Node.is_confirmation_message(message) or self.message_already_seen(message):
+        # Só buscas são descartadas como repetidas. As demais mensagens (PING, HELLO, REPLICA, UNLINK, VAL, BYE)
+        # podem reservar seu número depois de uma busca que ainda está sendo enviada aos vizinhos e chegar antes
+        # dela; se avançassem o último número visto, o vizinho descartaria a busca como repetida
+        if Node.is_confirmation_message(message) or parts[3] != "SEARCH":
+            return
+
+        # Não marca mensagens já vistas
+        if self.message_already_seen(message):
             return
 
         # Não marca mensagens enviadas pelo próprio nó
@@ -197,6 +684,7 @@ class Node:
 
         self.last_seen_messages[origin] = int(sequence_number)
 
+    @profiler.profiled("dedup")
     def message_already_seen(self, message: str) -> bool:
         """Verifica se uma mensagem já foi vista."""
         parts = message.split(" ")
@@ -205,50 +693,131 @@ class Node:
         return origin in self.last_seen_messages and int(sequence_number) <= self.last_seen_messages[origin]
 
     @staticmethod
-    def confirm_message(connection: socket.socket, message: str) -> None:
-        """Confirma o recebimento de uma mensagem."""
+    def confirm_message(connection: socket.socket, message: str) -> str | None:
+        """Confirma o recebimento de uma mensagem, retornando a confirmação enviada."""
         # Não confirma mensagens de confirmação
         if Node.is_confirmation_message(message):
-            return
+            return None
 
         operacao = message.split(" ")[3]
-        connection.sendall(f"{operacao}_OK".encode())
+        confirmation = f"{operacao}_OK"
+        connection.sendall(confirmation.encode())
+        return confirmation
+
+    @staticmethod
+    def neighbor_address(message: str, sender_ip: str, sender_port: int) -> str:
+        """
+        Retorna o endereço de escuta (ip:porta) do vizinho que entregou a mensagem.
+        Só confirmações chegam pelas conexões abertas por este nó; as demais chegam por conexões abertas pelo
+        vizinho, cuja porta é efêmera, então a porta vem do último salto das buscas ou da origem das outras.
+        """
+        if Node.is_confirmation_message(message):
+            return f"{sender_ip}:{sender_port}"
+
+        parts = message.split(" ")
+        if parts[3] == "SEARCH":
+            return f"{sender_ip}:{parts[5]}"
+        return parts[0]
+
+    @staticmethod
+    def is_heartbeat_message(message: str) -> bool:
+        """Verifica se uma mensagem é um heartbeat."""
+        return message[-5:] == " PING"
 
     @staticmethod
     def is_confirmation_message(message: str) -> bool:
         """Verifica se uma mensagem é uma confirmação de recebimento."""
         return message[-3:] == "_OK"
 
+    @staticmethod
+    def split_messages(buffer: bytes, framed: bool) -> tuple[list[bytes], bytes]:
+        """
+        Separa as mensagens recebidas em buffer, retornando as mensagens completas e o início da próxima.
+        Em uma conexão framed, cada mensagem termina com MESSAGE_DELIMITER; nas demais, de nós de versões
+        anteriores ou enviadas antes de o HELLO ser respondido, cada recv é uma mensagem.
+        """
+        if framed:
+            *messages, rest = buffer.split(MESSAGE_DELIMITER)
+            return [message for message in messages if message], rest
+
+        # Confirmações não têm delimitador: chegam juntas, ex: b"SEARCH_OKPING_OK", ou cortadas entre dois recv
+        confirmations = re.fullmatch(rb"((?:[A-Z]+_OK)*)([A-Z_]*)", buffer)
+        if confirmations is None:
+            return [buffer], b""
+        return re.findall(rb"[A-Z]+_OK", confirmations.group(1)), confirmations.group(2)
+
     def receive_message(self, connection: socket.socket) -> None:
         """Recebe mensagens de um nó conectado."""
+        buffer = b""
+        framed = False  # Passa a ser True na primeira mensagem com delimitador recebida pela conexão
         try:
             while True:
                 data = connection.recv(1024)
                 if not data:
                     break
-                message = data.decode()
-                sender_ip, sender_port = connection.getpeername()
-                self.interpret_message(message, sender_ip=sender_ip, sender_port=sender_port)
-                if not Node.is_confirmation_message(message):
-                    self.confirm_message(connection, message)
-                    self.mark_message_as_seen(message)
+                framed = framed or MESSAGE_DELIMITER in data
+                messages, buffer = Node.split_messages(buffer + data, framed)
+                for message in messages:
+                    if self.profiler is None:
+                        self.process_message(connection, message)
+                    else:
+                        with self.profiler.message():
+                            self.process_message(connection, message)
         except ConnectionResetError:
             pass  # Isso vai ocorrer quando um dos peers forem fechados, seja voluntariamente ou não
         except ConnectionAbortedError:
             pass
+        except OSError:
+            pass  # Socket fechado por delete_neighbor enquanto esperava mensagens
         finally:
             connection.close()
 
+    def process_message(self, connection: socket.socket, data: bytes) -> None:
+        """Processa uma mensagem recebida de um nó conectado e confirma seu recebimento."""
+        with self.profile_stage("decode"):
+            message = data.decode()
+            sender_ip, sender_port = connection.getpeername()
+        if self.metrics is not None:
+            peer = Node.neighbor_address(message, sender_ip, sender_port)
+            self.metrics.record_received(message, peer, len(data))
+        if self.trace is not None:
+            self.trace.record(message_trace.RECEIVED, f"{sender_ip}:{sender_port}", data)
+
+        if Node.is_confirmation_message(message):
+            self.interpret_message(message, sender_ip=sender_ip, sender_port=sender_port)
+            return
+
+        # A confirmação é enviada antes de processar a mensagem, então o RTT medido pelo vizinho
+        # não inclui o tempo de processamento deste nó
+        with self.profile_stage("ack"):
+            confirmation = self.confirm_message(connection, message)
+        if self.metrics is not None:
+            self.metrics.record_sent(confirmation, peer, len(confirmation))
+        if self.trace is not None:
+            self.trace.record(message_trace.SENT, f"{sender_ip}:{sender_port}", confirmation.encode())
+
+        # Durante a inicialização em segundo plano, a mensagem só é processada com os vizinhos iniciais na tabela
+        self.neighbors_loaded.wait()
+        self.interpret_message(message, sender_ip=sender_ip, sender_port=sender_port)
+        self.mark_message_as_seen(message)
+
     def interpret_message(self, message: str, sender_ip: str, sender_port: int) -> None:
         """Interpreta uma mensagem recebida."""
-        if Node.is_confirmation_message(message):
+        with self.profile_stage("parse"):
+            if self.profiler is not None:
+                self.profiler.set_message_type(metrics.message_type(message))
+            is_confirmation = Node.is_confirmation_message(message)
+            parts = message.split(" ")
+
+        if is_confirmation:
             self.handle_confirmation_message(sender_ip, sender_port)
             return
 
-        parts = message.split(" ")
         operacao = parts[3]
 
-        print(f'Mensagem recebida: "{message}"')
+        if operacao != "PING":
+            with self.profile_stage("print"):
+                print(f'Mensagem recebida: "{message}"')
 
         if operacao == "HELLO":
             self.handle_message_hello(message)
@@ -271,25 +840,98 @@ class Node:
         elif operacao == "VAL":
             self.handle_value(message)
 
+        elif operacao == "REPLICA":
+            self.handle_message_replica(message)
+
+        elif operacao == "UNLINK":
+            self.handle_message_unlink(message)
+
+        elif operacao == "PING":
+            pass  # Heartbeat, a confirmação enviada ao receber já é a resposta
+
         else:
-            raise ValueError(f"Operação inválida: {operacao}")
+            # Operação de uma versão mais nova, ignorada para não derrubar a conexão com o vizinho
+            print(f"Operação desconhecida ignorada: {operacao}")
 
+    @profiler.profiled("handler")
     def handle_confirmation_message(self, sender_ip: str, sender_port: int) -> None:
         """Lida com uma mensagem de confirmação."""
-        print(f'    Envio feito com sucesso: "{self.messages_not_confirmed[f"{sender_ip}:{sender_port}"].pop(0)}"')
+        pending = self.messages_not_confirmed.get(f"{sender_ip}:{sender_port}")
+        if not pending:
+            return  # Vizinho removido enquanto a confirmação estava a caminho
+
+        message, sent_at = pending.pop(0)
+        now = time.monotonic()
+        self.missed_heartbeats[(sender_ip, sender_port)] = 0  # Qualquer confirmação mostra que o vizinho responde
+        self.rtts.update((sender_ip, sender_port), now - sent_at)
+        if self.metrics is not None:
+            self.metrics.record_ack_latency(now - sent_at)
+
+        if Node.is_heartbeat_message(message):
+            return
+        print(f'    Envio feito com sucesso: "{message}"')
 
+    @profiler.profiled("handler")
     def handle_message_hello(self, message: str) -> None:
         """Lida com uma mensagem HELLO."""
-        origin = message.split(" ")[0]
+        parts = message.split(" ")
+        origin = parts[0]
         ip, port = utils.convert_str_to_ip_port(origin)
+        is_new = (ip, port) not in self.neighbors
+
+        # HELLOs de versões anteriores não anunciam operações opcionais (4 partes, ou 6 com a reorganização)
+        capabilities = frozenset(parts[4].split(",")) if len(parts) in (5, 7) else frozenset()
+
+        if self.rewiring is not None and is_new and len(self.neighbors) >= self.rewiring.max_neighbors:
+            self.reject_neighbor(ip, port)
+            return
         self.add_neighbor(ip, port)
+        if (ip, port) not in self.neighbors:
+            return
+        self.neighbor_capabilities[(ip, port)] = capabilities
 
+        # Quem se conectou primeiro ainda não conhece as operações deste nó, então o HELLO é respondido
+        if is_new and capabilities:
+            self.send_hello(self.neighbors[(ip, port)])
+
+        # HELLO de um nó com a reorganização habilitada anuncia seus vizinhos e outros pares conhecidos
+        if self.rewiring is not None and len(parts) in (6, 7):
+            self.rewiring.learn((ip, port), rewiring.decode_addresses(parts[-2]), rewiring.decode_addresses(parts[-1]))
+
+    def supports(self, neighbor: tuple[str, int], operation: str) -> bool:
+        """Verifica se o vizinho anunciou no HELLO que entende a operação opcional dada."""
+        return operation in self.neighbor_capabilities.get(neighbor, frozenset())
+
+    @profiler.profiled("handler")
     def handle_message_bye(self, message: str) -> None:
         """Lida com uma mensagem BYE."""
         origin = message.split(" ")[0]
         ip, port = utils.convert_str_to_ip_port(origin)
+        if self.rewiring is not None:
+            self.rewiring.unlinked((ip, port))  # BYE de quem aceitou um pedido de remoção deste nó
         self.delete_neighbor(ip, port)
 
+    @profiler.profiled("handler")
+    def handle_message_unlink(self, message: str) -> None:
+        """
+        Lida com um pedido de remoção de uma ligação redundante. Se aceito, o nó fecha a ligação com um BYE,
+        senão a ligação é mantida e quem pediu escolhe outra ligação mais tarde.
+        """
+        origin = message.split(" ")[0]
+        requester = utils.convert_str_to_ip_port(origin)
+        if self.rewiring is None or not self.rewiring.approve_unlink(requester, list(self.neighbors)):
+            print(f"Reorganizacao: mantendo ligacao com {origin}")
+            return
+
+        print(f"Reorganizacao: removendo ligacao redundante com {origin}")
+        try:
+            self.send_bye(self.neighbors[requester])
+        except (OSError, KeyError):
+            pass
+        self.delete_neighbor(*requester)
+        self.rewiring.dropped += 1
+
+    @profiler.profiled("handler")
     def handle_message_flooding(self, message: str, sender_ip: str) -> None:
         """Lida com uma mensagem de busca por flooding."""
         parts = message.split(" ")
@@ -305,39 +947,26 @@ class Node:
         # Verifica se a mensagem já foi vista ou se eu mesmo enviei
         if self.message_already_seen(message) or origin == f"{self.ip}:{self.port}":
             print("Flooding: Mensagem repetida")
+            if self.metrics is not None:
+                self.metrics.inc("p2p_duplicates_total", "SEARCH_FL")
             return
 
         self.mark_message_as_seen(message)
 
-        if key in self.data:
+        value = self.lookup_value(key)
+        if value is not None:
             print("Chave encontrada")
-            ip, port = utils.convert_str_to_ip_port(origin)
-            if (ip, port) in self.neighbors:
-                self.send_value(
-                    self.neighbors[(ip, port)],
-                    mode="FL",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-
-            else:
-                # Cria conexão temporária para enviar o valor
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((ip, port))
-                self.send_value(
-                    sock,
-                    mode="FL",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-                sock.close()
+            self.reply_value(origin, mode="FL", key=key, value=value, hop_count=hop_count)
             return
 
         ttl = int(ttl) - 1
         if ttl <= 0:
             print("TTL igual a zero, descartando mensagem")
+            if self.metrics is not None:
+                self.metrics.inc("p2p_ttl_expired_total", "SEARCH_FL")
+            return
+
+        if not self.within_rate_limit("SEARCH_FL", origin, f"{sender_ip}:{last_hop_port}"):
             return
 
         hop_count = int(hop_count) + 1
@@ -351,10 +980,11 @@ class Node:
         )
 
         # enviar para vizinhos exceto o transmissor da mensagem
-        for (ip, port), neighbor in self.neighbors.items():
+        for (ip, port), neighbor in list(self.neighbors.items()):
             if (ip, port) != (sender_ip, int(last_hop_port)):
-                self.send_message(neighbor, message)
+                self.try_send_message(neighbor, message)
 
+    @profiler.profiled("handler")
     def handle_message_random_walk(self, message: str, sender_ip: str) -> None:
         """Lida com uma mensagem de busca por random walk."""
         parts = message.split(" ")
@@ -366,36 +996,23 @@ class Node:
         hop_count = parts[7]
 
         self.num_messages_seen_random_walk += 1
+        if self.metrics is not None and self.message_already_seen(message):
+            self.metrics.inc("p2p_duplicates_total", "SEARCH_RW")  # O random walk voltou a este nó
 
-        if key in self.data:
+        value = self.lookup_value(key)
+        if value is not None:
             print("Chave encontrada")
-            ip, port = utils.convert_str_to_ip_port(origin)
-            if (ip, port) in self.neighbors:
-                self.send_value(
-                    self.neighbors[(ip, port)],
-                    mode="RW",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-
-            else:
-                # Cria conexão temporária para enviar o valor
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((ip, port))
-                self.send_value(
-                    sock,
-                    mode="RW",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-                sock.close()
+            self.reply_value(origin, mode="RW", key=key, value=value, hop_count=hop_count)
             return
 
         ttl = int(ttl) - 1
         if ttl <= 0:
             print("TTL igual a zero, descartando mensagem")
+            if self.metrics is not None:
+                self.metrics.inc("p2p_ttl_expired_total", "SEARCH_RW")
+            return
+
+        if not self.within_rate_limit("SEARCH_RW", origin, f"{sender_ip}:{last_hop_port}"):
             return
 
         hop_count = int(hop_count) + 1
@@ -410,10 +1027,12 @@ class Node:
 
         all_neighbors = list(self.neighbors.values())
         # Mensagem só volta pelo mesmo caminho se não houver outros vizinhos
-        if len(all_neighbors) > 1:
-            all_neighbors.remove(self.neighbors[(sender_ip, int(last_hop_port))])
-        self.send_message(random.choice(all_neighbors), message)
+        socket_no_anterior = self.neighbors.get((sender_ip, int(last_hop_port)))
+        if len(all_neighbors) > 1 and socket_no_anterior in all_neighbors:
+            all_neighbors.remove(socket_no_anterior)
+        self.try_send_message(self.choose_neighbor(all_neighbors), message)
 
+    @profiler.profiled("handler")
     def handle_message_depth_first(self, message: str, sender_ip: str) -> None:
         """Lida com uma mensagem de busca em profundidade."""
         parts = message.split(" ")
@@ -427,65 +1046,64 @@ class Node:
         self.num_messages_seen_depth_first += 1
 
         no_anterior = f"{sender_ip}:{last_hop_port}"
-        socket_no_anterior = self.neighbors[(sender_ip, int(last_hop_port))]
+        socket_no_anterior = self.neighbors.get((sender_ip, int(last_hop_port)))
 
-        if key in self.data:
+        value = self.lookup_value(key)
+        if value is not None:
             print("Chave encontrada")
-            ip, port = utils.convert_str_to_ip_port(origin)
-            if (ip, port) in self.neighbors:
-                self.send_value(
-                    self.neighbors[(ip, port)],
-                    mode="BP",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-
-            else:
-                # Cria conexão temporária para enviar o valor
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((ip, port))
-                self.send_value(
-                    sock,
-                    mode="BP",
-                    key=key,
-                    value=self.data[key],
-                    hop_count=hop_count
-                )
-                sock.close()
+            self.reply_value(origin, mode="BP", key=key, value=value, hop_count=hop_count)
             return
 
         ttl = int(ttl) - 1
         if ttl <= 0:
             print("TTL igual a zero, descartando mensagem")
+            if self.metrics is not None:
+                self.metrics.inc("p2p_ttl_expired_total", "SEARCH_BP")
+            return
+
+        # O nó anterior pode ter sido removido da tabela enquanto a mensagem era recebida
+        if socket_no_anterior is None:
+            print(f"BP: nó anterior {no_anterior} não é vizinho, descartando mensagem")
             return
 
-        if not self.message_already_seen(message):
-            self.info_busca_em_profundidade["no_mae"] = no_anterior
-            self.info_busca_em_profundidade["vizinhos_candidatos"] = list(self.neighbors.values())
+        state = self.depth_first_searches.get(origin, int(sequence_number))
+        if state is None:
+            # Só a chegada de uma busca é limitada: descartar o retrocesso de uma busca em andamento
+            # faria o nó anterior concluir que nenhum vizinho tem a chave
+            if not self.within_rate_limit("SEARCH_BP", origin, f"{sender_ip}:{last_hop_port}"):
+                return
+            state = self.depth_first_searches.start(
+                origin, int(sequence_number), no_anterior, list(self.neighbors.values()))
 
-        self.info_busca_em_profundidade["vizinhos_candidatos"].remove(socket_no_anterior)
+        # Quando a mensagem volta do vizinho ativo, ele já foi removido dos candidatos ao ser escolhido
+        if socket_no_anterior in state["vizinhos_candidatos"]:
+            state["vizinhos_candidatos"].remove(socket_no_anterior)
 
         # Condicão de parada
-        if self.info_busca_em_profundidade["no_mae"] == f"{self.ip}:{self.port}" and \
-                self.info_busca_em_profundidade["vizinho_ativo"] == socket_no_anterior and \
-                len(self.info_busca_em_profundidade["vizinhos_candidatos"]) == 0:
+        if state["no_mae"] == f"{self.ip}:{self.port}" and \
+                state["vizinho_ativo"] == socket_no_anterior and \
+                len(state["vizinhos_candidatos"]) == 0:
             print(f"BP: Não foi possível localizar a chave {key}")
             return
 
-        if self.info_busca_em_profundidade["vizinho_ativo"] is not None and \
-                self.info_busca_em_profundidade["vizinho_ativo"] != socket_no_anterior:
+        if state["vizinho_ativo"] is not None and \
+                state["vizinho_ativo"] != socket_no_anterior:
             print("BP: ciclo detectado, devolvendo a mensagem...")
+            if self.metrics is not None:
+                self.metrics.inc("p2p_duplicates_total", "SEARCH_BP")
             proximo_socket = socket_no_anterior
-        elif len(self.info_busca_em_profundidade["vizinhos_candidatos"]) == 0:
+        elif len(state["vizinhos_candidatos"]) == 0:
             print("BP: nenhum vizinho encontrou a chave, retrocedendo...")
-            ip_mae, port_mae = utils.convert_str_to_ip_port(self.info_busca_em_profundidade["no_mae"])
-            socket_no_mae = self.neighbors[(ip_mae, port_mae)]
+            ip_mae, port_mae = utils.convert_str_to_ip_port(state["no_mae"])
+            socket_no_mae = self.neighbors.get((ip_mae, port_mae))
+            if socket_no_mae is None:
+                print(f"BP: nó mãe {state['no_mae']} não é vizinho, descartando mensagem")
+                return
             proximo_socket = socket_no_mae
         else:
-            proximo_socket = random.choice(self.info_busca_em_profundidade["vizinhos_candidatos"])
-            self.info_busca_em_profundidade["vizinho_ativo"] = proximo_socket
-            self.info_busca_em_profundidade["vizinhos_candidatos"].remove(proximo_socket)
+            proximo_socket = self.choose_neighbor(state["vizinhos_candidatos"])
+            state["vizinho_ativo"] = proximo_socket
+            state["vizinhos_candidatos"].remove(proximo_socket)
 
         hop_count = int(hop_count) + 1
         message = self.craft_message(
@@ -496,11 +1114,26 @@ class Node:
             key=key,
             hop_count=hop_count
         )
-        self.send_message(proximo_socket, message)
+        self.try_send_message(proximo_socket, message)
+
+    @profiler.profiled("handler")
+    def handle_message_replica(self, message: str) -> None:
+        """Lida com uma mensagem REPLICA, guardando o par chave-valor se a replicação estiver habilitada."""
+        parts = message.split(" ")
+        key = parts[4]
+        value = parts[5]
 
+        if self.replicas is None or key in self.data:
+            return
+
+        print(f"Guardando replica ({key}, {value})")
+        self.replicas.put(key, value)
+
+    @profiler.profiled("handler")
     def handle_value(self, message: str) -> None:
         """Lida com uma mensagem VALUE."""
         parts = message.split(" ")
+        responder = parts[0]
         mode = parts[4]
         key = parts[5]
         value = parts[6]
@@ -510,38 +1143,130 @@ class Node:
             print("Chave já existe na tabela")
             return
 
+        session = self.search_sessions.find(mode, key)
+        if session is None:
+            print(f"Valor recebido sem busca correspondente, descartando. Chave: {key}")
+            return
+
+        if not session.register_response(responder, value, int(hop_count)):
+            print(f"Resposta duplicada de {responder} para a chave {key}, descartando")
+            return
+
         print(f"Valor encontrado! Chave: {key} Valor: {value}")
+        print(f"    Primeira resposta em {session.first_response_latency * 1000:.2f} ms")
 
+        latency = round(session.first_response_latency * 1_000_000)  # microssegundos
         if mode == "FL":
-            self.hop_count_flooding.append(int(hop_count))
+            self.hop_count_flooding.record(int(hop_count))
+            self.latency_flooding.record(latency)
         if mode == "RW":
-            self.hop_count_random_walk.append(int(hop_count))
+            self.hop_count_random_walk.record(int(hop_count))
+            self.latency_random_walk.record(latency)
         if mode == "BP":
-            self.hop_count_depth_first.append(int(hop_count))
+            self.hop_count_depth_first.record(int(hop_count))
+            self.latency_depth_first.record(latency)
+        if self.adaptive_ttl is not None:
+            self.adaptive_ttl.record(mode, int(hop_count))
+
+        if self.replicas is not None:
+            # Próximas buscas pela chave, daqui ou dos vizinhos, terminam em no máximo 1 salto
+            self.replicas.put(key, value)
+            self.send_replica(key, value)
 
+    @profiler.profiled("send")
     def send_message(self, sock: socket.socket, message: str) -> None:
         """Envia uma mensagem para um nó e."""
         ip, port = sock.getpeername()
         destino = f"{ip}:{port}"
-        print(f'Encaminhando mensagem: "{message}" para {destino}')
-
-        if self.messages_not_confirmed.get(destino) is None:
-            self.messages_not_confirmed[destino] = []
-        self.messages_not_confirmed[destino].append(message)
-
-        sock.sendall(message.encode())
+        if not Node.is_heartbeat_message(message):
+            print(f'Encaminhando mensagem: "{message}" para {destino}')
+
+        # Só as conexões com vizinhos são lidas; a confirmação de uma conexão temporária nunca chega
+        if self.neighbors.get((ip, port)) is sock:
+            if self.messages_not_confirmed.get(destino) is None:
+                self.messages_not_confirmed[destino] = []
+            self.messages_not_confirmed[destino].append((message, time.monotonic()))
+
+        data = message.encode()
+        # Sem delimitador, duas mensagens enviadas em sequência podem ser lidas pelo vizinho como uma só
+        framed_data = data + MESSAGE_DELIMITER if self.supports((ip, port), "FRAMED") else data
+        with self.send_lock(sock):
+            sock.sendall(framed_data)
+        if self.metrics is not None:
+            self.metrics.record_sent(message, destino, len(data))
+        if self.trace is not None:
+            self.trace.record(message_trace.SENT, destino, data)
+
+    def try_send_message(self, sock: socket.socket, message: str) -> bool:
+        """
+        Envia uma mensagem para um vizinho que pode ter sido removido por outra thread, ex: pelos heartbeats,
+        depois que a lista de vizinhos foi copiada. Retorna se a mensagem foi enviada.
+        """
+        try:
+            self.send_message(sock, message)
+            return True
+        except OSError:
+            print(f'Erro ao enviar mensagem: "{message}", vizinho removido ou desconectado')
+            return False
+
+    def send_lock(self, sock: socket.socket) -> threading.Lock:
+        """Retorna a trava de envio do socket, que impede que duas threads escrevam nele ao mesmo tempo."""
+        with self.send_locks_lock:
+            return self.send_locks.setdefault(sock, threading.Lock())
+
+    def next_sequence_number(self) -> int:
+        """
+        Reserva o número de sequência de uma nova mensagem originada pelo nó.
+        Mensagens são originadas tanto pelo menu quanto pelas threads de recebimento (ex: VALUE, REPLICA),
+        então a leitura e o incremento precisam ser atômicos para que duas mensagens nunca usem o mesmo número.
+        """
+        with self.sequence_lock:
+            sequence_number = self.sequence_number
+            self.sequence_number += 1
+        return sequence_number
 
     def send_hello(self, peer: socket.socket) -> None:
         """Envia uma mensagem HELLO para um vizinho."""
         message = self.craft_message(MessageType.HELLO)
         self.send_message(peer, message)
-        self.sequence_number += 1
+
+    def send_heartbeat(self, peer: socket.socket) -> None:
+        """Envia um heartbeat (PING) para um vizinho."""
+        message = self.craft_message(MessageType.PING)
+        self.send_message(peer, message)
 
     def send_bye(self, peer: socket.socket) -> None:
         """Envia uma mensagem BYE para um vizinho."""
         message = self.craft_message(MessageType.BYE)
         self.send_message(peer, message)
-        self.sequence_number += 1
+
+    def send_unlink(self, peer: socket.socket) -> None:
+        """Pede a um vizinho a remoção da ligação redundante com ele."""
+        message = self.craft_message(MessageType.UNLINK)
+        self.send_message(peer, message)
+
+    def send_replica(self, key: str, value: str) -> None:
+        """Envia uma réplica de um par chave-valor para todos os vizinhos que entendem REPLICA."""
+        message = self.craft_message(MessageType.REPLICA, key=key, value=value)
+        for address, neighbor in list(self.neighbors.items()):
+            if self.supports(address, "REPLICA"):
+                self.try_send_message(neighbor, message)
+
+    def reply_value(self, origin: str, **kwargs) -> None:
+        """Envia um valor encontrado para a origem da busca."""
+        ip, port = utils.convert_str_to_ip_port(origin)
+        try:
+            neighbor = self.neighbors.get((ip, port))
+            if neighbor is not None:
+                self.send_value(neighbor, **kwargs)
+                return
+
+            # Cria conexão temporária para enviar o valor
+            sock = self.open_connection(ip, port)
+            self.send_value(sock, **kwargs)
+            sock.close()
+        except OSError:
+            print(f"Erro ao enviar o valor para {origin}")
 
     def send_value(self, peer: socket.socket, **kwargs) -> None:
         """Envia um valor para um nó."""
@@ -557,61 +1282,123 @@ class Node:
             value=value,
             hop_count=hop_count)
         self.send_message(peer, message)
-        self.sequence_number += 1
 
-    def start_search_flooding(self, key: str) -> None:
-        """Inicia uma busca por flooding."""
+    def search_ttl(self, mode: str) -> int:
+        """Retorna o TTL da primeira tentativa de uma busca: o padrão, ou o aprendido se o TTL adaptativo for usado."""
+        if self.adaptive_ttl is None:
+            return self.default_ttl
+        return self.adaptive_ttl.ttl(mode, self.default_ttl)
+
+    def begin_search_session(self, mode: str, key: str, retry: Optional[search.SearchSession]) -> search.SearchSession:
+        """
+        Reserva o número de sequência de uma busca e cria sua sessão ou, se retry não for None,
+        registra uma nova tentativa com TTL maior.
+        """
+        sequence_number = self.next_sequence_number()
+        if retry is None:
+            return self.search_sessions.start(sequence_number, mode, key, self.search_ttl(mode))
+        ttl = self.adaptive_ttl.retry_ttl(retry.ttl, retry.attempts, self.default_ttl)
+        return self.search_sessions.retry(retry, sequence_number, ttl)
+
+    def schedule_retry(self, session: search.SearchSession) -> None:
+        """Agenda a repetição de uma busca se ela ficar sem resposta, quando o TTL adaptativo está habilitado."""
+        if self.adaptive_ttl is None:
+            return
+        timer = threading.Timer(self.adaptive_ttl.timeout, self.retry_search, args=(session, session.attempts))
+        timer.daemon = True
+        timer.start()
+
+    def retry_search(self, session: search.SearchSession, attempt: int) -> None:
+        """Repete com o dobro do TTL uma busca que continua sem resposta após a tentativa attempt."""
+        if session.resolved or session.attempts != attempt:
+            return
+
+        if self.adaptive_ttl.exhausted_retries(session.attempts, session.ttl, self.default_ttl):
+            print(f"Busca {session.mode} pela chave {session.key} sem resposta apos {session.attempts} tentativas")
+            self.adaptive_ttl.count_exhausted(session.mode)
+            return
+
+        print(f"Busca {session.mode} pela chave {session.key} sem resposta com TTL {session.ttl}, repetindo")
+        self.adaptive_ttl.count_retry(session.mode)
+        start_search = {
+            "FL": self.start_search_flooding,
+            "RW": self.start_search_random_walk,
+            "BP": self.start_search_depth_first,
+        }
+        start_search[session.mode](session.key, retry=session)
+
+    def start_search_flooding(self, key: str, retry: Optional[search.SearchSession] = None) -> None:
+        """Inicia uma busca por flooding, ou uma nova tentativa de retry."""
+        session = self.begin_search_session("FL", key, retry)
         message = self.craft_message(
             MessageType.SEARCH_FLOODING,
+            sequence_number=session.sequence_number,
             key=key,
+            ttl=session.ttl,
             hop_count=1)
 
-        for neighbor in self.neighbors.values():
-            self.send_message(neighbor, message)
-        self.sequence_number += 1
+        for neighbor in list(self.neighbors.values()):
+            self.try_send_message(neighbor, message)
+        self.schedule_retry(session)
 
-    def start_search_random_walk(self, key: str) -> None:
-        """Inicia uma busca por random walk."""
+    def start_search_random_walk(self, key: str, retry: Optional[search.SearchSession] = None) -> None:
+        """Inicia uma busca por random walk, ou uma nova tentativa de retry."""
+        session = self.begin_search_session("RW", key, retry)
         message = self.craft_message(
             MessageType.SEARCH_RANDOM_WALK,
+            sequence_number=session.sequence_number,
             key=key,
+            ttl=session.ttl,
             hop_count=1)
-        neighbor = random.choice(list(self.neighbors.values()))
-        self.send_message(neighbor, message)
-        self.sequence_number += 1
+        neighbor = self.choose_neighbor(list(self.neighbors.values()))
+        self.try_send_message(neighbor, message)
+        self.schedule_retry(session)
 
-    def start_search_depth_first(self, key: str) -> None:
-        """Inicia uma busca em profundidade."""
-        self.info_busca_em_profundidade["no_mae"] = f"{self.ip}:{self.port}"
-        self.info_busca_em_profundidade["vizinhos_candidatos"] = list(self.neighbors.values())
-        self.info_busca_em_profundidade["vizinho_ativo"] = \
-            random.choice(self.info_busca_em_profundidade["vizinhos_candidatos"])
+    def start_search_depth_first(self, key: str, retry: Optional[search.SearchSession] = None) -> None:
+        """Inicia uma busca em profundidade, ou uma nova tentativa de retry."""
+        session = self.begin_search_session("BP", key, retry)
 
-        self.info_busca_em_profundidade["vizinhos_candidatos"].remove(
-            self.info_busca_em_profundidade["vizinho_ativo"])
+        # Quando a mensagem voltar para a origem, o estado já existe e ela não é tratada como uma nova busca
+        own_address = f"{self.ip}:{self.port}"
+        state = self.depth_first_searches.start(
+            own_address, session.sequence_number, own_address, list(self.neighbors.values()))
+        state["vizinho_ativo"] = self.choose_neighbor(state["vizinhos_candidatos"])
+        state["vizinhos_candidatos"].remove(state["vizinho_ativo"])
 
         message = self.craft_message(
             MessageType.SEARCH_DEPTH_FIRST,
-            last_hop_port=self.port,
+            sequence_number=session.sequence_number,
             key=key,
+            ttl=session.ttl,
             hop_count=1)
+        self.try_send_message(state["vizinho_ativo"], message)
+        self.schedule_retry(session)
 
-        self.send_message(self.info_busca_em_profundidade["vizinho_ativo"], message)
-        self.sequence_number += 1
-
+    @profiler.profiled("craft")
     def craft_message(self, message_type: MessageType, **kwargs) -> str:
-        """Cria uma mensagem para ser enviada."""
+        """
+        Cria uma mensagem para ser enviada.
+        Mensagens originadas pelo nó sem número de sequência dado reservam o próximo número de sequência.
+        """
         origin = kwargs.get("origin", f"{self.ip}:{self.port}")
-        sequence_number = kwargs.get("sequence_number", self.sequence_number)
+        sequence_number = kwargs.get("sequence_number")
+        if sequence_number is None:
+            sequence_number = self.next_sequence_number()
         key = kwargs.get("key")
         hop_count = kwargs.get("hop_count")
         ttl = kwargs.get("ttl", self.default_ttl)
 
         if message_type == MessageType.HELLO:
-            return self.craft_message_hello()
+            return self.craft_message_hello(sequence_number)
 
         if message_type == MessageType.BYE:
-            return self.craft_message_bye()
+            return self.craft_message_bye(sequence_number)
+
+        if message_type == MessageType.PING:
+            return self.craft_message_ping(sequence_number)
+
+        if message_type == MessageType.UNLINK:
+            return self.craft_message_unlink(sequence_number)
 
         if message_type == MessageType.SEARCH_FLOODING:
             return self.craft_message_search_flooding(
@@ -642,28 +1429,55 @@ class Node:
 
         if message_type == MessageType.VALUE:
             return self.craft_message_value(
+                sequence_number=sequence_number,
                 mode=kwargs.get("mode"),
                 key=key,
                 value=kwargs.get("value"),
                 hop_count=hop_count
             )
 
+        if message_type == MessageType.REPLICA:
+            return self.craft_message_replica(sequence_number=sequence_number, key=key, value=kwargs.get("value"))
+
         # Só entra aqui se esquecer de implementar alguma opção
         raise ValueError(f"Operação inválida: {message_type}")
 
-    def craft_message_hello(self) -> str:
+    def craft_message_hello(self, sequence_number: int) -> str:
         """
         Cria uma mensagem HELLO.
-        Formato da mensagem <ORIGIN> <SEQNO> <TTL> <OPERACAO>
+        Formato da mensagem <ORIGIN> <SEQNO> <TTL> <OPERACAO> <OPERACOES_OPCIONAIS>
+        Com a reorganização habilitada, seguida de <VIZINHOS> <PARES_CONHECIDOS>
         """
-        return f"{self.ip}:{self.port} {self.sequence_number} {1} HELLO"
+        if self.rewiring is None:
+            return f"{self.ip}:{self.port} {sequence_number} {1} HELLO {','.join(CAPABILITIES)}"
 
-    def craft_message_bye(self) -> str:
+        # Só nós com a reorganização habilitada aceitam pedidos de remoção de ligações
+        message = f"{self.ip}:{self.port} {sequence_number} {1} HELLO {','.join(CAPABILITIES + ('UNLINK',))}"
+
+        neighbors = list(self.neighbors)
+        peers = self.rewiring.peer_sample((self.ip, self.port), neighbors)
+        return f"{message} {rewiring.encode_addresses(neighbors)} {rewiring.encode_addresses(peers)}"
+
+    def craft_message_bye(self, sequence_number: int) -> str:
         """
         Cria uma mensagem BYE.
         Formato da mensagem <ORIGIN> <SEQNO> <TTL> <OPERACAO>
         """
-        return f"{self.ip}:{self.port} {self.sequence_number} {1} BYE"
+        return f"{self.ip}:{self.port} {sequence_number} {1} BYE"
+
+    def craft_message_ping(self, sequence_number: int) -> str:
+        """
+        Cria uma mensagem PING (heartbeat).
+        Formato da mensagem <ORIGIN> <SEQNO> <TTL> <OPERACAO>
+        """
+        return f"{self.ip}:{self.port} {sequence_number} {1} PING"
+
+    def craft_message_unlink(self, sequence_number: int) -> str:
+        """
+        Cria uma mensagem UNLINK (pedido de remoção da ligação).
+        Formato da mensagem <ORIGIN> <SEQNO> <TTL> <OPERACAO>
+        """
+        return f"{self.ip}:{self.port} {sequence_number} {1} UNLINK"
 
     def craft_message_search_flooding(
             self,
@@ -712,6 +1526,7 @@ class Node:
 
     def craft_message_value(
             self,
+            sequence_number: int,
             mode: str,
             key: str,
             value: str,
@@ -721,7 +1536,14 @@ class Node:
         Cria uma mensagem VALUE.
         Formato da mensagem <ORIGIN> <SEQNO> <TTL> VAL <MODE> <KEY> <VALUE> <HOP_COUNT>
         """
-        return f"{self.ip}:{self.port} {self.sequence_number} {self.default_ttl} VAL {mode} {key} {value} {hop_count}"
+        return f"{self.ip}:{self.port} {sequence_number} {self.default_ttl} VAL {mode} {key} {value} {hop_count}"
+
+    def craft_message_replica(self, sequence_number: int, key: str, value: str) -> str:
+        """
+        Cria uma mensagem REPLICA.
+        Formato da mensagem <ORIGIN> <SEQNO> <TTL> REPLICA <KEY> <VALUE>
+        """
+        return f"{self.ip}:{self.port} {sequence_number} {1} REPLICA {key} {value}"
 
     def pick_neighbor(self) -> socket.socket | None:
         """Retorna o vizinho escolhido pelo usuário"""
@@ -758,6 +1580,10 @@ class Node:
             self.show_statistics()
         elif option == MenuOptions.ALTERAR_TTL.value:
             self.handle_menu_alterar_ttl()
+        elif option == MenuOptions.EXPORTAR_ESTATISTICAS.value:
+            self.handle_menu_exportar_estatisticas()
+        elif option == MenuOptions.PERFIL.value:
+            self.handle_menu_perfil()
         elif option == MenuOptions.SAIR.value:
             self.handle_menu_quit()
 
@@ -783,6 +1609,20 @@ class Node:
             return
         self.send_hello(peer)
 
+    def show_local_value(self, key: str) -> bool:
+        """Imprime o valor de key se estiver na tabela local ou no cache de réplicas. Retorna se foi encontrado."""
+        if key in self.data:
+            print("Valor na tabela local")
+            print(f"    chave: {key} valor: {self.data[key]}")
+            return True
+
+        value = None if self.replicas is None else self.replicas.get(key)
+        if value is None:
+            return False
+        print("Valor no cache de replicas")
+        print(f"    chave: {key} valor: {value}")
+        return True
+
     def handle_menu_search_flooding(self) -> None:
         """Lida com a opção do menu de iniciar uma busca por flooding."""
         print("Digite a chave a ser buscada")
@@ -791,10 +1631,7 @@ class Node:
             print("Chave inválida")
             return
 
-        if key in self.data:
-            print("Valor na tabela local")
-            print(f"    chave: {key} valor: {self.data[key]}")
-        else:
+        if not self.show_local_value(key):
             self.start_search_flooding(key)
 
     def handle_menu_search_random_walk(self) -> None:
@@ -805,10 +1642,7 @@ class Node:
             print("Chave inválida")
             return
 
-        if key in self.data:
-            print("Valor na tabela local")
-            print(f"    chave: {key} valor: {self.data[key]}")
-        else:
+        if not self.show_local_value(key):
             self.start_search_random_walk(key)
 
     def handle_menu_search_depth_first(self) -> None:
@@ -819,10 +1653,7 @@ class Node:
             print("Chave inválida")
             return
 
-        if key in self.data:
-            print("Valor na tabela local")
-            print(f"    chave: {key} valor: {self.data[key]}")
-        else:
+        if not self.show_local_value(key):
             self.start_search_depth_first(key)
 
     def handle_menu_alterar_ttl(self) -> None:
@@ -833,12 +1664,29 @@ class Node:
             print("Valor de TTL inválido")
             return
 
-        self.default_ttl = novo_ttl
+        self.default_ttl = int(novo_ttl)
+
+    def handle_menu_exportar_estatisticas(self) -> None:
+        """Lida com a opção do menu de exportar as estatísticas em JSON."""
+        file_path = f"estatisticas_{self.port}.json"
+        with open(file_path, "w") as file:
+            json.dump(self.statistics_snapshot(), file, indent=2)
+        print(f"Estatisticas exportadas para {file_path}")
+
+    def handle_menu_perfil(self) -> None:
+        """Lida com a opção do menu de perfil: habilita o perfil ou, se já habilitado, mostra e salva relatórios."""
+        if self.profiler is None:
+            self.enable_profiler()
+            return
+        self.show_profile()
 
     def handle_menu_quit(self) -> None:
         """Lida com a opção do menu de sair."""
-        for peer in self.neighbors.values():
-            self.send_bye(peer)
+        for peer in list(self.neighbors.values()):
+            try:
+                self.send_bye(peer)
+            except OSError:
+                pass  # Vizinho removido pelos heartbeats enquanto os BYEs eram enviados
 
     @staticmethod
     def is_valid_key(key: str) -> bool:
@@ -856,37 +1704,228 @@ class Node:
     [4] SEARCH (busca em profundidade)
     [5] Estatisticas
     [6] Alterar valor padrao de TTL
+    [7] Exportar estatisticas (JSON)
+    [8] Perfil de desempenho (habilitar/exportar)
     [9] Sair"""
               )
 
 
-def create_node() -> Node:
-    """Cria um nó da rede P2P usando os argumentos passados na inicialização do programa."""
-    # Se não houver argumentos suficientes, exibe uma mensagem de erro e encerra o programa
-    if len(sys.argv) < 2:  # sys.argv[0] é o nome do arquivo
-        raise SystemExit("Esperado no mínimo 1 argumento, recebido 0")
-
+def build_argument_parser() -> argparse.ArgumentParser:
+    """Cria o leitor dos argumentos passados na inicialização do programa."""
+    parser = argparse.ArgumentParser(description="Nó de uma rede P2P não estruturada")
+    parser.add_argument("endereco", help="endereço do nó no formato ip:porta")
+    parser.add_argument("vizinhos", nargs="?", help="arquivo com os vizinhos do nó, um ip:porta por linha")
+    parser.add_argument("chave_valor", nargs="?", help="arquivo com os pares chave-valor do nó")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="porta local onde as métricas são exportadas no formato do Prometheus (desabilitado por padrão)"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["etapas", "cprofile"],
+        help="habilita o perfil de desempenho por etapa; 'cprofile' também executa o cProfile nas mensagens recebidas"
+    )
+    parser.add_argument(
+        "--sync-startup",
+        action="store_true",
+        help="carrega as chaves e conecta-se aos vizinhos antes de aceitar conexões e mostrar o menu"
+    )
+    parser.add_argument(
+        "--ready-file",
+        help="arquivo onde o tempo de cada etapa da inicialização é gravado, em JSON, quando o nó fica pronto"
+    )
+    parser.add_argument("--trace", help="arquivo onde as mensagens recebidas e enviadas são gravadas")
+    parser.add_argument(
+        "--adaptive-ttl",
+        type=float,
+        nargs="?",
+        const=95,
+        metavar="PERCENTIL",
+        help="TTL das buscas igual ao percentil (padrão: 95) dos saltos das buscas bem-sucedidas mais a margem"
+    )
+    parser.add_argument(
+        "--adaptive-ttl-margin",
+        type=int,
+        default=2,
+        help="saltos somados ao percentil pelo TTL adaptativo (padrão: 2)"
+    )
+    parser.add_argument(
+        "--adaptive-ttl-timeout",
+        type=float,
+        default=1.0,
+        help="segundos sem resposta até uma busca ser repetida com o dobro do TTL (padrão: 1.0)"
+    )
+    parser.add_argument(
+        "--adaptive-ttl-retries",
+        type=int,
+        default=2,
+        help="repetições de uma busca sem resposta, a última com o TTL padrão (padrão: 2)"
+    )
+    parser.add_argument(
+        "--forwarding",
+        choices=["random", "rtt"],
+        default="random",
+        help="escolha do próximo vizinho em buscas RW e BP: ao acaso ou ponderada pelo RTT (padrão: random)"
+    )
+    parser.add_argument(
+        "--origin-rate",
+        type=float,
+        help="máximo de buscas por segundo de uma mesma origem encaminhadas pelo nó (sem limite por padrão)"
+    )
+    parser.add_argument(
+        "--neighbor-rate",
+        type=float,
+        help="máximo de buscas por segundo de um mesmo vizinho encaminhadas pelo nó (sem limite por padrão)"
+    )
+    parser.add_argument(
+        "--rate-burst",
+        type=float,
+        default=10,
+        help="rajada de buscas aceita acima dos limites de taxa (padrão: 10)"
+    )
+    parser.add_argument(
+        "--rewire",
+        type=int,
+        metavar="GRAU_ALVO",
+        help="reorganiza os vizinhos em segundo plano em direção a GRAU_ALVO vizinhos (desabilitado por padrão)"
+    )
+    parser.add_argument(
+        "--max-neighbors",
+        type=int,
+        default=8,
+        help="máximo de vizinhos aceitos com a reorganização habilitada (padrão: 8)"
+    )
+    parser.add_argument(
+        "--rewire-interval",
+        type=float,
+        default=5.0,
+        help="segundos entre as rodadas de reorganização (padrão: 5.0)"
+    )
+    parser.add_argument(
+        "--heartbeat",
+        type=float,
+        help="intervalo em segundos entre heartbeats enviados aos vizinhos (desabilitado por padrão)"
+    )
+    parser.add_argument(
+        "--heartbeat-misses",
+        type=int,
+        default=3,
+        help="heartbeats sem resposta até um vizinho ser removido (padrão: 3)"
+    )
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        help="habilita a replicação de chaves encontradas, guardando até este número de réplicas"
+    )
+    parser.add_argument(
+        "--replica-ttl",
+        type=float,
+        default=60.0,
+        help="segundos até uma réplica expirar e deixar de responder buscas (padrão: 60.0)"
+    )
+    return parser
+
+
+def load_node_arguments(
+        args: argparse.Namespace,
+        read_key_values: bool = True
+) -> tuple[str, int, Optional[list[tuple[str, int]]], Optional[dict[str, str]]]:
+    """
+    Valida o endereço do nó e lê os arquivos de vizinhos e chave-valor passados como argumento.
+    Se read_key_values for False, o arquivo chave-valor não é lido.
+    """
     neighbors = None
     data = None
 
-    ip, port = utils.convert_str_to_ip_port(sys.argv[1])
+    ip, port = utils.convert_str_to_ip_port(args.endereco)
 
     if not utils.is_valid_ip(ip) or not utils.is_valid_port(port):
         raise ValueError(f"IP ou porta inválidos {ip}:{port}")
 
-    if len(sys.argv) >= 3:
-        neighbors = utils.get_all_neighbors_from_file(sys.argv[2])
+    if args.vizinhos is not None:
+        neighbors = utils.get_all_neighbors_from_file(args.vizinhos)
 
-    if len(sys.argv) >= 4:
-        data = utils.get_key_value_from_file(sys.argv[3])
+    if args.chave_valor is not None and read_key_values:
+        data = utils.get_key_value_from_file(args.chave_valor)
 
-    return Node(ip, port, neighbors, data)
+    return ip, port, neighbors, data
 
 
-if __name__ == '__main__':
-    node = create_node()
+def configure_node(node: Node, args: argparse.Namespace) -> None:
+    """Habilita os recursos opcionais pedidos nos argumentos."""
+    if args.ready_file is not None:
+        node.enable_ready_file(args.ready_file)
+
+    if args.metrics_port is not None:
+        node.enable_metrics(args.metrics_port)
+
+    if args.profile is not None:
+        node.enable_profiler(use_cprofile=args.profile == "cprofile")
+
+    if args.trace is not None:
+        node.enable_trace(args.trace)
+
+    if args.replicas is not None:
+        node.enable_replication(args.replicas, args.replica_ttl)
+
+    if args.adaptive_ttl is not None:
+        node.enable_adaptive_ttl(
+            args.adaptive_ttl, args.adaptive_ttl_margin, args.adaptive_ttl_timeout, args.adaptive_ttl_retries)
+
+    if args.forwarding == "rtt":
+        node.enable_rtt_forwarding()
+
+    if args.origin_rate is not None or args.neighbor_rate is not None:
+        node.enable_rate_limits(args.origin_rate, args.neighbor_rate, args.rate_burst)
+
+    if args.rewire is not None:
+        node.enable_rewiring(args.rewire, args.max_neighbors, args.rewire_interval)
+
+    if args.heartbeat is not None:
+        node.enable_heartbeats(args.heartbeat, args.heartbeat_misses)
+
+
+def create_node() -> Node:
+    """Cria um nó da rede P2P usando os argumentos passados na inicialização do programa."""
+    args = build_argument_parser().parse_args()
+    # Criadas antes do nó para contar os HELLOs enviados aos vizinhos iniciais
+    node_metrics = None if args.metrics_port is None else metrics.Metrics()
+    if args.sync_startup:
+        node = Node(*load_node_arguments(args), node_metrics=node_metrics)
+        configure_node(node, args)
+        return node
+
+    # O nó aceita conexões assim que é criado; chaves e vizinhos são carregados em segundo plano
+    ip, port, neighbors, _ = load_node_arguments(args, read_key_values=False)
+    node = Node(ip, port, None, None, load=False, node_metrics=node_metrics)
+    configure_node(node, args)
+    key_values = None if args.chave_valor is None else utils.iterate_key_values_from_file(args.chave_valor)
+    threading.Thread(target=load_or_exit, args=(node, neighbors, key_values), daemon=True).start()
+    return node
+
+
+def load_or_exit(
+        node: Node,
+        neighbors: list[tuple[str, int]],
+        key_values: Optional[Iterable[tuple[str, str]]]
+) -> None:
+    """Carrega o nó em segundo plano, encerrando o programa se o arquivo de chaves não puder ser lido."""
+    try:
+        node.load(neighbors, key_values, background=True)
+    except (OSError, ValueError) as error:
+        print(f"Erro ao carregar o nó: {error}", file=sys.stderr)
+        os._exit(1)  # sys.exit só encerraria esta thread
+
+
+def run(node: Node) -> None:
+    """Aceita conexões em uma thread separada e executa o menu de comandos do nó."""
     thread = threading.Thread(target=node.receive_connections, args=(), daemon=True)
     thread.start()
     node.show_menu()
     while True:
         node.handle_menu_action()
+
+
+if __name__ == '__main__':
+    run(create_node())
@@ -0,0 +1,219 @@
+import time
+import contextlib
+import functools
+import threading
+import histogram
+from typing import Any, Callable, TYPE_CHECKING
+
+# cProfile e pstats só são importados quando usados, para não atrasar a inicialização dos nós
+if TYPE_CHECKING:
+    import cProfile
+
+
+# Contexto vazio usado no lugar dos medidores quando o perfil está desabilitado
+DISABLED = contextlib.nullcontext()
+
+
+class StageTimer:
+    """Mede o tempo de uma etapa do processamento de uma mensagem, usado com a instrução with."""
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        """Inicializa a etapa name."""
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> "StageTimer":
+        """Inicia a medição da etapa."""
+        self.profiler.push(self.name)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Finaliza a medição da etapa."""
+        self.profiler.pop()
+
+
+class MessageTimer:
+    """Agrupa as etapas do processamento de uma mensagem recebida, usado com a instrução with."""
+
+    def __init__(self, profiler: "Profiler") -> None:
+        """Inicializa a medição de uma mensagem."""
+        self.profiler = profiler
+
+    def __enter__(self) -> "MessageTimer":
+        """Inicia a medição da mensagem e, se habilitado, o cProfile da thread."""
+        self.profiler.begin_message()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Finaliza a medição, atribuindo as etapas ao tipo da mensagem."""
+        self.profiler.end_message()
+
+
+class CProfileSnapshot:
+    """Estatísticas de um cProfile já coletadas, no formato aceito por pstats.Stats."""
+
+    def __init__(self, profile: "cProfile.Profile") -> None:
+        """Copia as estatísticas de profile sem desabilitá-lo."""
+        profile.snapshot_stats()
+        self.stats = profile.stats
+
+    def create_stats(self) -> None:
+        """As estatísticas já foram coletadas no construtor."""
+
+
+class Profiler:
+    """
+    Perfil do processamento de mensagens, dividido em etapas (decode, parse, dedup, handler, craft, send, ack).
+    As etapas podem ser aninhadas: o tempo próprio de cada pilha de etapas é acumulado no formato
+    "folded" usado para gerar flamegraphs, e o tempo total de cada etapa por tipo de mensagem
+    é guardado em histogramas.
+    """
+
+    # Tipo atribuído às etapas executadas fora do processamento de uma mensagem recebida (ex: menu)
+    LOCAL = "LOCAL"
+
+    def __init__(self, use_cprofile: bool = False) -> None:
+        """Inicializa o perfil vazio. Se use_cprofile, também executa o cProfile nas mensagens recebidas."""
+        self.use_cprofile = use_cprofile
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        self.stages: dict[tuple[str, str], histogram.Histogram] = {}  # (tipo, etapa): tempos em microssegundos
+        self.folded: dict[str, int] = {}  # pilha "tipo;etapa;etapa": tempo próprio em microssegundos
+        self.profiles: list["cProfile.Profile"] = []
+        self.cprofile_skipped = 0  # mensagens recebidas sem cProfile, ver begin_message
+
+    def stage(self, name: str) -> StageTimer:
+        """Retorna um medidor para a etapa name."""
+        return StageTimer(self, name)
+
+    def message(self) -> MessageTimer:
+        """Retorna um medidor para o processamento completo de uma mensagem recebida."""
+        return MessageTimer(self)
+
+    def thread_state(self) -> Any:
+        """Retorna o estado de medição da thread atual, criando-o se necessário."""
+        state = self.local
+        if not hasattr(state, "frames"):
+            state.frames = []  # pilha de [etapa, início, tempo das etapas filhas]
+            state.records = []  # (pilha, etapa, tempo próprio, tempo total) das etapas já finalizadas
+            state.message_type = None
+            state.in_message = False
+            state.profile = None
+            state.profiling = False
+        return state
+
+    def begin_message(self) -> None:
+        """Inicia o processamento de uma mensagem recebida na thread atual."""
+        state = self.thread_state()
+        state.in_message = True
+        state.message_type = None
+
+        if self.use_cprofile:
+            if state.profile is None:
+                import cProfile
+                state.profile = cProfile.Profile()
+                with self.lock:
+                    self.profiles.append(state.profile)
+            try:
+                state.profile.enable()
+                state.profiling = True
+            except ValueError:
+                # No Python 3.12+ o cProfile usa sys.monitoring, que aceita um só perfilador ativo por vez:
+                # enquanto outra thread está sendo perfilada, a mensagem só tem suas etapas medidas
+                with self.lock:
+                    self.cprofile_skipped += 1
+
+    def set_message_type(self, message_type: str) -> None:
+        """Define o tipo da mensagem sendo processada na thread atual."""
+        self.thread_state().message_type = message_type
+
+    def end_message(self) -> None:
+        """Finaliza o processamento de uma mensagem e registra suas etapas."""
+        state = self.thread_state()
+        if state.profiling:
+            state.profile.disable()
+            state.profiling = False
+
+        self.commit(state, state.message_type or "DESCONHECIDO")
+        state.in_message = False
+
+    def push(self, name: str) -> None:
+        """Inicia uma etapa na thread atual."""
+        self.thread_state().frames.append([name, time.perf_counter_ns(), 0])
+
+    def pop(self) -> None:
+        """Finaliza a etapa mais recente da thread atual."""
+        end = time.perf_counter_ns()
+        state = self.thread_state()
+        name, start, children = state.frames.pop()
+        total = end - start
+
+        path = ";".join([frame[0] for frame in state.frames] + [name])
+        state.records.append((path, name, total - children, total))
+        if state.frames:
+            state.frames[-1][2] += total
+        elif not state.in_message:
+            self.commit(state, Profiler.LOCAL)
+
+    def commit(self, state: Any, message_type: str) -> None:
+        """Acumula as etapas finalizadas da thread atual no perfil."""
+        records, state.records = state.records, []
+        with self.lock:
+            for path, name, self_time, total in records:
+                folded_path = f"{message_type};{path}"
+                self.folded[folded_path] = self.folded.get(folded_path, 0) + self_time // 1000
+
+                key = (message_type, name)
+                if key not in self.stages:
+                    self.stages[key] = histogram.Histogram()
+                self.stages[key].record(total // 1000)
+
+    def summary(self) -> list[tuple[str, str, int, float, int, float]]:
+        """Retorna (tipo, etapa, quantidade, média em µs, p99 em µs, total em ms), do maior tempo total ao menor."""
+        with self.lock:
+            stages = list(self.stages.items())
+
+        rows = []
+        for (message_type, name), timings in stages:
+            rows.append((
+                message_type,
+                name,
+                timings.count,
+                timings.mean(),
+                timings.percentile(99),
+                timings.mean() * timings.count / 1000
+            ))
+        return sorted(rows, key=lambda row: row[5], reverse=True)
+
+    def dump_folded(self, file_path: str) -> None:
+        """Salva as pilhas de etapas no formato "folded", aceito por flamegraph.pl e speedscope."""
+        with self.lock:
+            folded = sorted(self.folded.items())
+        with open(file_path, "w") as file:
+            for path, microseconds in folded:
+                file.write(f"{path} {microseconds}\n")
+
+    def dump_cprofile(self, file_path: str) -> bool:
+        """Salva as estatísticas do cProfile de todas as threads. Retorna False se não houver nenhuma."""
+        with self.lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return False
+
+        import pstats
+        pstats.Stats(*[CProfileSnapshot(profile) for profile in profiles]).dump_stats(file_path)
+        return True
+
+
+def profiled(stage: str) -> Callable:
+    """Decorador que mede o método como uma etapa quando o perfil do nó (self.profiler) está habilitado."""
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.stage(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
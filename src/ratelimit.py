@@ -0,0 +1,127 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Balde de fichas: acumula rate fichas por segundo, até burst, e cada mensagem consome uma ficha."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Inicializa o balde cheio."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.drops = 0  # mensagens descartadas
+
+    def consume(self, now: float) -> bool:
+        """Consome uma ficha, se houver. Retorna False, contando a mensagem como descartada, se ela excede o limite."""
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated_at) * self.rate)
+        self.updated_at = max(self.updated_at, now)
+        if self.tokens < 1:
+            self.drops += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self, now: float) -> bool:
+        """Verifica se o balde já se encheu, ou seja, se descartá-lo não muda o limite da sua chave."""
+        return self.tokens + max(0.0, now - self.updated_at) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """
+    Um balde de fichas por chave (origem ou vizinho), mantendo no máximo max_keys baldes.
+    Com todos os baldes em uso, chaves novas dividem um balde extra em vez de tomar o lugar do balde
+    de uma chave ativa, então origens forjadas não conseguem renovar a rajada de uma origem real.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 1024) -> None:
+        """Inicializa sem baldes; o balde de uma chave é criado cheio na sua primeira mensagem."""
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Limite de taxa inválido: {rate} mensagens/s, rajada de {burst}")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, TokenBucket] = OrderedDict()  # do menos ao mais recentemente usado
+        self.overflow = TokenBucket(rate, burst)  # dividido pelas chaves que não couberam em buckets
+        self.dropped = 0  # total de mensagens descartadas, incluindo as de chaves cujo balde foi descartado
+        self.lock = threading.Lock()
+
+    def bucket(self, key: str, now: float) -> TokenBucket:
+        """
+        Retorna o balde de key, criando-o se necessário. Com max_keys baldes, o menos usado recentemente
+        só é descartado se já estiver cheio; senão key usa o balde extra.
+        """
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            self.buckets.move_to_end(key)
+            return bucket
+
+        if len(self.buckets) >= self.max_keys:
+            oldest_key, oldest = next(iter(self.buckets.items()))
+            if not oldest.full(now):
+                return self.overflow
+            del self.buckets[oldest_key]
+        bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def allow(self, key: str) -> bool:
+        """Verifica se uma mensagem de key está dentro do limite, contando-a como descartada se não estiver."""
+        with self.lock:
+            now = time.monotonic()
+            if self.bucket(key, now).consume(now):
+                return True
+            self.dropped += 1
+            return False
+
+    def to_dict(self) -> dict[str, object]:
+        """Retorna o limite configurado e as mensagens descartadas no total, pelo balde extra e por chave."""
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "dropped": self.dropped,
+                "overflow_drops": self.overflow.drops,
+                "drops": {key: bucket.drops for key, bucket in self.buckets.items() if bucket.drops},
+            }
+
+
+class ForwardingLimits:
+    """
+    Limites de taxa aplicados antes de encaminhar buscas de outros nós: um por origem da busca
+    e um por vizinho que a entregou. Respostas VALUE e confirmações nunca são limitadas.
+    """
+
+    def __init__(self, origin_rate: float | None, neighbor_rate: float | None, burst: float) -> None:
+        """Inicializa os limites; uma taxa None desabilita o limite correspondente."""
+        self.origins = None if origin_rate is None else RateLimiter(origin_rate, burst)
+        self.neighbors = None if neighbor_rate is None else RateLimiter(neighbor_rate, burst)
+        self.drops_by_type: dict[str, int] = {}  # tipo da mensagem: mensagens descartadas
+        self.lock = threading.Lock()
+
+    def allow(self, message_type: str, origin: str, neighbor: str) -> bool:
+        """Verifica se uma busca de origin, entregue por neighbor, pode ser encaminhada."""
+        # O balde do vizinho só é consumido se a origem estiver dentro do limite
+        allowed = (self.origins is None or self.origins.allow(origin)) and \
+            (self.neighbors is None or self.neighbors.allow(neighbor))
+        if not allowed:
+            with self.lock:
+                self.drops_by_type[message_type] = self.drops_by_type.get(message_type, 0) + 1
+        return allowed
+
+    def dropped(self) -> int:
+        """Retorna o total de mensagens descartadas."""
+        with self.lock:
+            return sum(self.drops_by_type.values())
+
+    def to_dict(self) -> dict[str, object]:
+        """Retorna os limites e as mensagens descartadas por tipo, por origem e por vizinho."""
+        with self.lock:
+            drops_by_type = dict(self.drops_by_type)
+        return {
+            "origin": None if self.origins is None else self.origins.to_dict(),
+            "neighbor": None if self.neighbors is None else self.neighbors.to_dict(),
+            "drops_by_type": drops_by_type,
+        }
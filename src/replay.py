@@ -0,0 +1,135 @@
+import os
+import time
+import random
+import argparse
+import contextlib
+import node
+import utils
+import message_trace
+from typing import Optional
+
+
+class ReplaySocket:
+    """Socket falso usado no replay: não abre conexões e descarta tudo que é enviado."""
+
+    def __init__(self, ip: str, port: int) -> None:
+        """Inicializa o socket falso de um par ip:porta."""
+        self.address = (ip, port)
+
+    def getpeername(self) -> tuple[str, int]:
+        """Retorna o endereço do outro lado da conexão."""
+        return self.address
+
+    def sendall(self, data: bytes) -> None:
+        """Descarta os dados enviados."""
+
+    def recv(self, _: int) -> bytes:
+        """Não há nada a receber, a conexão é encerrada imediatamente."""
+        return b""
+
+    def listen(self) -> None:
+        """Nenhuma conexão é aceita durante o replay."""
+
+    def close(self) -> None:
+        """Não há conexão a fechar."""
+
+
+class ReplayNode(node.Node):
+    """Nó que processa mensagens de um trace sem usar a rede."""
+
+    @staticmethod
+    def create_socket(ip: str, port: int) -> ReplaySocket:
+        """Não abre a porta do nó durante o replay."""
+        return ReplaySocket(ip, port)
+
+    @staticmethod
+    def open_connection(ip: str, port: int, timeout: Optional[float] = None) -> ReplaySocket:
+        """Não abre conexões durante o replay."""
+        return ReplaySocket(ip, port)
+
+
+def replay(
+        records: list[message_trace.TraceRecord],
+        replay_node: ReplayNode,
+        real_time: bool = False
+) -> tuple[int, int, float]:
+    """
+    Entrega as mensagens recebidas do trace ao nó, na ordem em que foram gravadas.
+    Retorna (mensagens processadas, mensagens com erro, tempo gasto em segundos).
+    """
+    processed = 0
+    errors = 0
+    started_at = time.perf_counter()
+
+    for record in records:
+        if record.direction != message_trace.RECEIVED:
+            continue
+
+        if real_time:
+            delay = record.timestamp - (time.perf_counter() - started_at)
+            if delay > 0:
+                time.sleep(delay)
+
+        ip, port = utils.convert_str_to_ip_port(record.peer)
+        timer = contextlib.nullcontext() if replay_node.profiler is None else replay_node.profiler.message()
+        try:
+            with timer:
+                replay_node.process_message(ReplaySocket(ip, port), record.data)
+        except (ValueError, IndexError, KeyError) as error:
+            # O nó pode divergir da execução original (ex: estado anterior ao trace), o replay continua
+            errors += 1
+            print(f"Erro ao processar {record.data!r}: {error!r}")
+        processed += 1
+
+    return processed, errors, time.perf_counter() - started_at
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Lê os argumentos passados na inicialização do programa."""
+    parser = argparse.ArgumentParser(description="Reproduz offline as mensagens recebidas gravadas em um trace")
+    parser.add_argument("trace", help="arquivo gravado com node.py --trace")
+    parser.add_argument("vizinhos", nargs="?", help="arquivo com os vizinhos do nó, um ip:porta por linha")
+    parser.add_argument("chave_valor", nargs="?", help="arquivo com os pares chave-valor do nó")
+    parser.add_argument("--seed", type=int, default=0, help="semente das escolhas aleatórias (padrão: 0)")
+    parser.add_argument("--tempo-real", action="store_true", help="respeita os intervalos entre as mensagens")
+    parser.add_argument("--quiet", action="store_true", help="não imprime a saída do nó")
+    parser.add_argument("--profile", action="store_true", help="imprime o tempo de cada etapa ao final")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Reproduz um trace e imprime a vazão obtida."""
+    args = parse_arguments()
+    random.seed(args.seed)
+
+    node_address, records = message_trace.read_trace(args.trace)
+    ip, port = utils.convert_str_to_ip_port(node_address)
+
+    # Vizinhos são os do arquivo mais todos para quem o nó enviou mensagens no trace.
+    # Confirmações são enviadas pela conexão aberta pelo outro nó, que não usa a porta dele
+    neighbors = utils.get_all_neighbors_from_file(args.vizinhos) if args.vizinhos is not None else []
+    for record in records:
+        peer = utils.convert_str_to_ip_port(record.peer)
+        if record.direction == message_trace.SENT and not record.data.endswith(b"_OK") and peer not in neighbors:
+            neighbors.append(peer)
+    data = utils.get_key_value_from_file(args.chave_valor) if args.chave_valor is not None else None
+
+    output = open(os.devnull, "w") if args.quiet else None
+    with contextlib.redirect_stdout(output) if args.quiet else contextlib.nullcontext():
+        replay_node = ReplayNode(ip, port, neighbors, data)
+        if args.profile:
+            replay_node.enable_profiler()
+        processed, errors, elapsed = replay(records, replay_node, args.tempo_real)
+    if output is not None:
+        output.close()
+
+    print(f"Trace de {node_address}: {len(records)} registros")
+    print(f"Mensagens processadas: {processed} ({errors} com erro) em {elapsed * 1000:.2f} ms")
+    if elapsed > 0:
+        print(f"Vazão: {processed / elapsed:.0f} mensagens/s")
+    if args.profile:
+        replay_node.show_profile()
+
+
+if __name__ == '__main__':
+    main()
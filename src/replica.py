@@ -0,0 +1,66 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ReplicaCache:
+    """
+    Réplicas de pares chave-valor de outros nós, limitadas a max_entries e descartadas pela menos usada.
+    Cada réplica expira ttl segundos depois de guardada, para que um valor alterado na origem deixe de ser respondido.
+    """
+
+    def __init__(self, max_entries: int, ttl: float = 60.0) -> None:
+        """Inicializa o cache vazio."""
+        if max_entries <= 0:
+            raise ValueError(f"Tamanho do cache de réplicas deve ser positivo: {max_entries}")
+        if ttl <= 0:
+            raise ValueError(f"Validade das réplicas deve ser positiva: {ttl}")
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Chave: (valor, instante em que a réplica foi guardada)
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str) -> str | None:
+        """Retorna o valor replicado de key, ou None se não houver réplica ou se ela tiver expirado."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            value = entry[0]
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """Guarda uma réplica de key, descartando a menos usada se o cache estiver cheio."""
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def to_dict(self) -> dict[str, int | float]:
+        """Retorna o tamanho, a validade e os contadores do cache."""
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
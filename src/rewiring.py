@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+Address = tuple[str, int]
+
+
+def encode_addresses(addresses: Iterable[Address]) -> str:
+    """Codifica endereços em um campo de mensagem: ip:porta separados por vírgula, ou "-" se não houver nenhum."""
+    return ",".join(f"{ip}:{port}" for ip, port in addresses) or "-"
+
+
+def decode_addresses(field: str) -> list[Address]:
+    """Decodifica um campo gerado por encode_addresses."""
+    if field == "-":
+        return []
+    addresses = []
+    for address in field.split(","):
+        ip, port = address.split(":")
+        addresses.append((ip, int(port)))
+    return addresses
+
+
+class Rewiring:
+    """
+    Reorganização da rede sobreposta: os vizinhos trocam suas listas de vizinhos e uma amostra dos pares
+    que conhecem em mensagens HELLO, e cada nó adiciona atalhos para pares distantes enquanto tiver menos
+    que target_degree vizinhos e remove ligações redundantes (vizinhos alcançáveis por outro vizinho)
+    enquanto tiver mais. A remoção é pedida ao vizinho, que só a aceita se quem pediu continuar alcançável
+    por outro vizinho seu, e cada nó participa de no máximo uma remoção por vez. Atalhos aleatórios
+    para pares distantes diminuem o diâmetro da rede, como em uma rede small-world.
+    """
+
+    def __init__(
+            self,
+            target_degree: int,
+            max_neighbors: int,
+            interval: float,
+            sample_size: int = 8,
+            max_known_peers: int = 256
+    ) -> None:
+        """Inicializa sem conhecer as listas de vizinhos dos vizinhos."""
+        if not 0 < target_degree <= max_neighbors:
+            raise ValueError(f"Grau alvo deve estar entre 1 e o máximo de vizinhos: {target_degree}, {max_neighbors}")
+
+        self.target_degree = target_degree
+        self.max_neighbors = max_neighbors
+        self.interval = interval
+        self.sample_size = sample_size
+        self.max_known_peers = max_known_peers
+
+        self.views: dict[Address, set[Address]] = {}  # vizinho: vizinhos que ele anunciou
+        self.known_peers: OrderedDict[Address, None] = OrderedDict()  # pares conhecidos, do mais antigo ao mais novo
+        self.lock = threading.Lock()
+        self.reserved_until = 0.0  # instante até o qual o nó não participa de outra remoção
+        self.unlink_requested: Optional[Address] = None  # vizinho a quem a remoção em andamento foi pedida
+
+        self.added = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def learn(self, sender: Address, neighbors: list[Address], peers: list[Address]) -> None:
+        """Registra os vizinhos e os pares conhecidos anunciados por sender."""
+        with self.lock:
+            self.views[sender] = set(neighbors)
+            for peer in [sender] + neighbors + peers:
+                self.known_peers[peer] = None
+                self.known_peers.move_to_end(peer)
+            while len(self.known_peers) > self.max_known_peers:
+                self.known_peers.popitem(last=False)
+
+    def forget(self, peer: Address) -> None:
+        """Descarta o que foi anunciado por peer e deixa de considerá-lo para atalhos."""
+        with self.lock:
+            self.views.pop(peer, None)
+            self.known_peers.pop(peer, None)
+
+    def peer_sample(self, own_address: Address, neighbors: Iterable[Address]) -> list[Address]:
+        """Retorna uma amostra aleatória dos pares conhecidos, que não são vizinhos, a ser anunciada aos vizinhos."""
+        excluded = set(neighbors) | {own_address}
+        with self.lock:
+            peers = [peer for peer in self.known_peers if peer not in excluded]
+        return random.sample(peers, min(self.sample_size, len(peers)))
+
+    def shortcut(self, own_address: Address, neighbors: Iterable[Address]) -> Optional[Address]:
+        """
+        Escolhe um par para adicionar como vizinho, se o nó tiver menos vizinhos que o grau alvo.
+        Pares que não são vizinhos de nenhum vizinho (a mais de 2 saltos) têm preferência.
+        """
+        neighbors = set(neighbors)
+        if len(neighbors) >= self.target_degree:
+            return None
+
+        with self.lock:
+            two_hops = set().union(*self.views.values()) if self.views else set()
+            candidates = [peer for peer in self.known_peers if peer not in neighbors and peer != own_address]
+        if not candidates:
+            return None
+
+        distant = [peer for peer in candidates if peer not in two_hops]
+        return random.choice(distant or candidates)
+
+    def redundant_link(self, neighbors: Iterable[Address]) -> Optional[Address]:
+        """
+        Escolhe um vizinho para remover, se o nó tiver mais vizinhos que o grau alvo: um vizinho que continua
+        alcançável por outro vizinho e que também tem mais vizinhos que o grau alvo.
+        """
+        neighbors = set(neighbors)
+        if len(neighbors) <= self.target_degree:
+            return None
+
+        with self.lock:
+            views = {neighbor: set(view) for neighbor, view in self.views.items() if neighbor in neighbors}
+
+        candidates = []
+        for neighbor, view in views.items():
+            alternatives = sum(1 for other in neighbors if other != neighbor and neighbor in views.get(other, ()))
+            if alternatives > 0 and len(view) > self.target_degree:
+                candidates.append((alternatives, len(view), neighbor))
+        if not candidates:
+            return None
+        return max(candidates)[2]
+
+    def reserve(self, duration: Optional[float] = None) -> bool:
+        """
+        Reserva o nó por duration segundos para participar da remoção de uma ligação, se ele não estiver em outra.
+        Depois de uma remoção a reserva dura 2 intervalos (o padrão), tempo para os vizinhos anunciarem suas
+        listas já sem a ligação removida, então duas remoções nunca decidem com as mesmas listas desatualizadas.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now < self.reserved_until:
+                return False
+            self.reserved_until = now + (2 * self.interval if duration is None else duration)
+            return True
+
+    def request_unlink(self, neighbor: Address) -> bool:
+        """
+        Reserva o nó enquanto o pedido de remoção da ligação com neighbor espera resposta.
+        Um pedido recusado não tem resposta, então essa reserva dura só meio intervalo.
+        """
+        if not self.reserve(self.interval / 2):
+            return False
+        with self.lock:
+            self.unlink_requested = neighbor
+        return True
+
+    def unlinked(self, neighbor: Address) -> None:
+        """Registra o fim da ligação com neighbor; se sua remoção foi pedida por este nó, estende a reserva."""
+        with self.lock:
+            if neighbor != self.unlink_requested:
+                return
+            self.unlink_requested = None
+            self.reserved_until = time.monotonic() + 2 * self.interval
+
+    def approve_unlink(self, requester: Address, neighbors: Iterable[Address]) -> bool:
+        """
+        Decide se aceita remover a ligação pedida por requester: o nó precisa ter mais vizinhos que o grau alvo,
+        requester precisa continuar alcançável por outro vizinho e o nó não pode estar em outra remoção.
+        """
+        neighbors = set(neighbors)
+        if requester not in neighbors or len(neighbors) <= self.target_degree:
+            return False
+
+        with self.lock:
+            reachable = any(requester in self.views.get(other, ()) for other in neighbors if other != requester)
+        return reachable and self.reserve()
+
+    def to_dict(self) -> dict[str, int]:
+        """Retorna a configuração e os contadores da reorganização."""
+        with self.lock:
+            known_peers = len(self.known_peers)
+        return {
+            "target_degree": self.target_degree,
+            "max_neighbors": self.max_neighbors,
+            "known_peers": known_peers,
+            "added": self.added,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,216 @@
+import os
+import time
+import random
+import argparse
+import threading
+import contextlib
+import node
+import utils
+from collections import deque
+from typing import Optional
+
+
+Topology = dict[int, list[int]]  # número do nó: números dos vizinhos
+
+
+def load_topology(directory: str) -> Topology:
+    """Lê uma topologia de exemplo: arquivos <número>.txt com os vizinhos do nó na porta 5000 + número."""
+    topology = {}
+    for file_name in os.listdir(directory):
+        number, extension = os.path.splitext(file_name)
+        if extension != ".txt" or not number.isdigit():
+            continue
+        neighbors = utils.get_all_neighbors_from_file(os.path.join(directory, file_name))
+        topology[int(number)] = [port - 5000 for _, port in neighbors]
+    return topology
+
+
+def line_topology(num_nodes: int) -> Topology:
+    """Retorna uma topologia em linha com num_nodes nós."""
+    return {
+        number: [neighbor for neighbor in (number - 1, number + 1) if 1 <= neighbor <= num_nodes]
+        for number in range(1, num_nodes + 1)
+    }
+
+
+def start_nodes(topology: Topology, base_port: int) -> dict[int, node.Node]:
+    """Inicia um nó por número da topologia, na porta base_port + número, com a chave chave<número>."""
+    nodes = {}
+    for number in topology:
+        nodes[number] = node.Node("127.0.0.1", base_port + number, [], {f"chave{number}": f"valor{number}"})
+        threading.Thread(target=nodes[number].receive_connections, daemon=True).start()
+
+    time.sleep(0.1)
+    for number, neighbors in topology.items():
+        addresses = [("127.0.0.1", base_port + neighbor) for neighbor in neighbors]
+        nodes[number].connect_to_neighbors(addresses)
+    time.sleep(0.2)
+    return nodes
+
+
+def current_topology(nodes: dict[int, node.Node], base_port: int) -> Topology:
+    """Retorna a topologia formada pelas tabelas de vizinhos dos nós, considerando as ligações nos dois sentidos."""
+    topology = {number: set() for number in nodes}
+    for number, current_node in nodes.items():
+        for _, port in list(current_node.neighbors):
+            neighbor = port - base_port
+            if neighbor in topology:
+                topology[number].add(neighbor)
+                topology[neighbor].add(number)
+    return {number: sorted(neighbors) for number, neighbors in topology.items()}
+
+
+def shortest_paths(topology: Topology) -> tuple[float, int]:
+    """Retorna a distância média e o diâmetro da topologia, em saltos, entre os pares de nós conectados."""
+    distances = []
+    for source in topology:
+        seen = {source: 0}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for neighbor in topology[current]:
+                if neighbor not in seen:
+                    seen[neighbor] = seen[current] + 1
+                    queue.append(neighbor)
+        distances.extend(distance for target, distance in seen.items() if target != source)
+    if not distances:
+        return 0.0, 0
+    return sum(distances) / len(distances), max(distances)
+
+
+def components(topology: Topology) -> int:
+    """Retorna o número de componentes conexos da topologia, 1 se nenhuma remoção particionou a rede."""
+    seen = set()
+    count = 0
+    for source in topology:
+        if source in seen:
+            continue
+        count += 1
+        seen.add(source)
+        queue = deque([source])
+        while queue:
+            for neighbor in topology[queue.popleft()]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return count
+
+
+def search_hop_count(source: node.Node, mode: str, key: str, timeout: float) -> Optional[int]:
+    """Executa uma busca de source pela chave e retorna os saltos da resposta, ou None se não houver resposta."""
+    if mode == "FL":
+        source.start_search_flooding(key)
+    elif mode == "RW":
+        source.start_search_random_walk(key)
+    else:
+        source.start_search_depth_first(key)
+
+    session = source.search_sessions.find(mode, key)
+    deadline = time.monotonic() + timeout
+    while not session.resolved and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return session.hop_count
+
+
+def measure(nodes: dict[int, node.Node], base_port: int, timeout: float) -> dict[str, float]:
+    """Mede a distância média, o diâmetro e os saltos médios das buscas entre todos os pares de nós."""
+    topology = current_topology(nodes, base_port)
+    mean_distance, diameter = shortest_paths(topology)
+    result = {
+        "grau medio": sum(len(current_node.neighbors) for current_node in nodes.values()) / len(nodes),
+        "componentes": components(topology),
+        "distancia media": mean_distance,
+        "diametro": diameter,
+    }
+
+    for mode in ("FL", "RW", "BP"):
+        hop_counts = []
+        failures = 0
+        for source_number, source in nodes.items():
+            for target_number in nodes:
+                if target_number == source_number:
+                    continue
+                hop_count = search_hop_count(source, mode, f"chave{target_number}", timeout)
+                if hop_count is None:
+                    failures += 1
+                else:
+                    hop_counts.append(hop_count)
+        result[f"saltos {mode}"] = sum(hop_counts) / len(hop_counts) if hop_counts else -1
+        result[f"falhas {mode}"] = failures
+    return result
+
+
+def benchmark(
+        name: str,
+        topology: Topology,
+        base_port: int,
+        args: argparse.Namespace
+) -> tuple[dict[str, float], dict[str, float]]:
+    """Mede uma topologia antes e depois de args.rodadas rodadas de reorganização."""
+    print(f"{name}: {len(topology)} nos", flush=True)
+    with open(os.devnull, "w") as output, contextlib.redirect_stdout(output):
+        nodes = start_nodes(topology, base_port)
+        before = measure(nodes, base_port, args.timeout)
+
+        for current_node in nodes.values():
+            current_node.enable_rewiring(args.grau_alvo, args.max_vizinhos, args.intervalo)
+        time.sleep(args.rodadas * args.intervalo)
+
+        after = measure(nodes, base_port, args.timeout)
+    return before, after
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Lê os argumentos passados na inicialização do programa."""
+    parser = argparse.ArgumentParser(
+        description="Mede os saltos das buscas nas topologias de exemplo antes e depois da reorganização dos vizinhos"
+    )
+    parser.add_argument(
+        "topologias",
+        nargs="*",
+        help="diretórios de topologias (padrão: todos os examples/topologia_*)"
+    )
+    parser.add_argument("--linha", type=int, default=12, help="também mede uma linha com N nós, 0 desabilita")
+    parser.add_argument("--grau-alvo", type=int, default=4, help="grau alvo da reorganização (padrão: 4)")
+    parser.add_argument("--max-vizinhos", type=int, default=8, help="máximo de vizinhos (padrão: 8)")
+    parser.add_argument("--intervalo", type=float, default=0.2, help="segundos entre rodadas (padrão: 0.2)")
+    parser.add_argument("--rodadas", type=int, default=15, help="rodadas de reorganização (padrão: 15)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="espera máxima por resposta (padrão: 2.0)")
+    parser.add_argument("--porta", type=int, default=7000, help="porta inicial dos nós (padrão: 7000)")
+    parser.add_argument("--seed", type=int, default=0, help="semente das escolhas aleatórias (padrão: 0)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Mede cada topologia e imprime uma tabela comparando antes e depois da reorganização."""
+    args = parse_arguments()
+    random.seed(args.seed)
+
+    directories = args.topologias
+    if not directories:
+        examples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+        directories = sorted(
+            os.path.join(examples, name) for name in os.listdir(examples) if name.startswith("topologia_")
+        )
+
+    topologies = [
+        (os.path.basename(os.path.normpath(directory)), load_topology(directory)) for directory in directories
+    ]
+    if args.linha > 0:
+        topologies.append((f"linha_{args.linha}", line_topology(args.linha)))
+
+    rows = []
+    for index, (name, topology) in enumerate(topologies):
+        # Cada topologia usa portas próprias, os nós das anteriores continuam abertos
+        before, after = benchmark(name, topology, args.porta + 100 * index, args)
+        rows.append((name, before, after))
+
+    print()
+    for name, before, after in rows:
+        print(name)
+        for metric in before:
+            print(f"    {metric:<16} {before[metric]:>8.2f} -> {after[metric]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import random
+import threading
+from typing import Any, Optional, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SmoothedRtt:
+    """
+    RTT suavizado de um vizinho, calculado como no TCP (RFC 6298):
+    SRTT e RTTVAR são médias móveis exponenciais das amostras e da variação entre elas.
+    """
+
+    ALPHA = 1 / 8  # peso de uma nova amostra no SRTT
+    BETA = 1 / 4  # peso de uma nova amostra no RTTVAR
+
+    def __init__(self) -> None:
+        """Inicializa a estimativa sem amostras."""
+        self.srtt: float | None = None  # segundos
+        self.rttvar = 0.0  # segundos
+        self.last_sample: float | None = None  # segundos
+        self.samples = 0
+
+    def update(self, sample: float) -> None:
+        """Atualiza a estimativa com uma amostra de RTT, em segundos."""
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - SmoothedRtt.BETA) * self.rttvar + SmoothedRtt.BETA * abs(self.srtt - sample)
+            self.srtt = (1 - SmoothedRtt.ALPHA) * self.srtt + SmoothedRtt.ALPHA * sample
+        self.last_sample = sample
+        self.samples += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        """Retorna a estimativa em milissegundos."""
+        return {
+            "srtt_ms": None if self.srtt is None else self.srtt * 1000,
+            "rttvar_ms": self.rttvar * 1000,
+            "last_ms": None if self.last_sample is None else self.last_sample * 1000,
+            "samples": self.samples,
+        }
+
+
+class RttTable:
+    """RTT suavizado de cada vizinho, chave: (ip, porta)."""
+
+    def __init__(self) -> None:
+        """Inicializa a tabela vazia."""
+        self.estimates: dict[tuple[str, int], SmoothedRtt] = {}
+        self.lock = threading.Lock()
+
+    def update(self, address: tuple[str, int], sample: float) -> None:
+        """Registra uma amostra de RTT, em segundos, do vizinho address."""
+        with self.lock:
+            if address not in self.estimates:
+                self.estimates[address] = SmoothedRtt()
+            self.estimates[address].update(sample)
+
+    def srtt(self, address: tuple[str, int]) -> float | None:
+        """Retorna o RTT suavizado do vizinho address, ou None se ainda não houver amostras."""
+        with self.lock:
+            estimate = self.estimates.get(address)
+            return None if estimate is None else estimate.srtt
+
+    def remove(self, address: tuple[str, int]) -> None:
+        """Descarta a estimativa do vizinho address."""
+        with self.lock:
+            self.estimates.pop(address, None)
+
+    def srtts(self) -> dict[tuple[str, int], float]:
+        """Retorna o RTT suavizado, em segundos, de todos os vizinhos com amostras."""
+        with self.lock:
+            return {address: estimate.srtt for address, estimate in self.estimates.items()}
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        """Retorna as estimativas de todos os vizinhos, chave: ip:porta."""
+        with self.lock:
+            return {f"{ip}:{port}": estimate.to_dict() for (ip, port), estimate in self.estimates.items()}
+
+    def choose(self, candidates: Sequence[T], addresses: Sequence[Optional[tuple[str, int]]]) -> T:
+        """
+        Escolhe um dos candidatos com probabilidade inversamente proporcional ao RTT de seu endereço.
+        Vizinhos ainda sem amostras (ou sem endereço conhecido) recebem o peso do mais rápido,
+        para que também sejam experimentados.
+        """
+        srtts = self.srtts()
+        known = [srtts[address] for address in addresses if srtts.get(address, 0) > 0]
+        if not known:
+            return random.choice(candidates)
+
+        fastest = min(known)
+        weights = [1 / srtts[address] if srtts.get(address, 0) > 0 else 1 / fastest for address in addresses]
+        return random.choices(candidates, weights=weights)[0]
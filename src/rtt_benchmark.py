@@ -0,0 +1,95 @@
+import os
+import time
+import random
+import argparse
+import threading
+import contextlib
+import node
+from typing import Callable
+
+
+# Número do nó: números dos vizinhos. O nó 1 busca a chave do nó 5 e pode seguir pelo nó 2, atrasado, ou pelo 3
+TOPOLOGY = {1: [2, 3], 2: [3], 3: [4], 4: [5], 5: []}
+SLOW_NODE = 2
+
+
+def delayed(process_message: Callable[..., None], delay: float) -> Callable[..., None]:
+    """Atrasa cada mensagem recebida antes de ser lida, como em uma ligação lenta: a confirmação também atrasa."""
+    def wrapper(*args, **kwargs) -> None:
+        time.sleep(delay)
+        process_message(*args, **kwargs)
+    return wrapper
+
+
+def start_nodes(base_port: int, delay: float, rtt_forwarding: bool) -> dict[int, node.Node]:
+    """Inicia os nós da topologia nas portas base_port + número, com o nó lento atrasando cada mensagem."""
+    nodes = {}
+    for number in TOPOLOGY:
+        nodes[number] = node.Node("127.0.0.1", base_port + number, [], {f"chave{number}": f"valor{number}"})
+        if number == SLOW_NODE:
+            nodes[number].process_message = delayed(nodes[number].process_message, delay)
+        if rtt_forwarding:
+            nodes[number].enable_rtt_forwarding()
+        threading.Thread(target=nodes[number].receive_connections, daemon=True).start()
+
+    time.sleep(0.1)
+    for number, neighbors in TOPOLOGY.items():
+        addresses = [("127.0.0.1", base_port + neighbor) for neighbor in neighbors]
+        nodes[number].connect_to_neighbors(addresses)
+    time.sleep(0.3)
+    return nodes
+
+
+def measure(source: node.Node, mode: str, num_searches: int, timeout: float) -> tuple[float, int]:
+    """Executa num_searches buscas pela chave do último nó e retorna a latência média, em ms, e as falhas."""
+    start_search = {"RW": source.start_search_random_walk, "BP": source.start_search_depth_first}[mode]
+    key = f"chave{max(TOPOLOGY)}"
+    latencies = []
+    failures = 0
+    for _ in range(num_searches):
+        start_search(key)
+        session = source.search_sessions.find(mode, key)
+        deadline = time.monotonic() + timeout
+        while not session.resolved and time.monotonic() < deadline:
+            time.sleep(0.001)
+        if session.resolved:
+            latencies.append(session.first_response_latency * 1000)
+        else:
+            failures += 1
+    return (sum(latencies) / len(latencies) if latencies else -1), failures
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Lê os argumentos passados na inicialização do programa."""
+    parser = argparse.ArgumentParser(
+        description="Mede a latência das buscas RW e BP com um vizinho lento, escolhendo vizinhos ao acaso ou pelo RTT"
+    )
+    parser.add_argument("--atraso", type=float, default=20.0, help="atraso do vizinho lento em ms (padrão: 20.0)")
+    parser.add_argument("--buscas", type=int, default=40, help="buscas de cada algoritmo (padrão: 40)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="espera máxima por resposta (padrão: 2.0)")
+    parser.add_argument("--porta", type=int, default=7000, help="porta inicial dos nós (padrão: 7000)")
+    parser.add_argument("--seed", type=int, default=0, help="semente das escolhas aleatórias (padrão: 0)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Mede cada forma de escolher o próximo vizinho e imprime a latência média de cada algoritmo."""
+    args = parse_arguments()
+    random.seed(args.seed)
+
+    results = {}
+    with open(os.devnull, "w") as output, contextlib.redirect_stdout(output):
+        for index, forwarding in enumerate(("random", "rtt")):
+            # Cada modo usa nós e portas próprios, os nós do anterior continuam abertos
+            nodes = start_nodes(args.porta + 10 * index, args.atraso / 1000, forwarding == "rtt")
+            results[forwarding] = {mode: measure(nodes[1], mode, args.buscas, args.timeout) for mode in ("RW", "BP")}
+
+    print(f"vizinho lento com {args.atraso:g} ms de atraso, media de {args.buscas} buscas (ms)")
+    for forwarding, result in results.items():
+        print(forwarding)
+        for mode, (latency, failures) in result.items():
+            print(f"    {mode}  {latency:>8.1f}  ({failures} falhas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Any
+
+
+class SearchSession:
+    """Acompanha uma busca iniciada por este nó desde o envio até as respostas recebidas."""
+
+    def __init__(self, sequence_number: int, mode: str, key: str, ttl: int) -> None:
+        """Inicializa uma sessão de busca com o instante de início."""
+        self.sequence_number = sequence_number  # da tentativa mais recente
+        self.mode = mode  # FL, RW ou BP
+        self.key = key
+        self.ttl = ttl  # da tentativa mais recente
+        self.attempts = 1
+        self.started_at = time.monotonic()
+
+        # Preenchidos na primeira resposta recebida
+        self.value: Optional[str] = None
+        self.hop_count: Optional[int] = None
+        self.first_response_latency: Optional[float] = None
+
+        self.responders: set[str] = set()  # ip:porta dos nós que responderam
+        self.duplicate_responses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def resolved(self) -> bool:
+        """Indica se a busca já recebeu alguma resposta."""
+        return self.first_response_latency is not None
+
+    def register_response(self, responder: str, value: str, hop_count: int) -> bool:
+        """
+        Registra uma resposta VALUE para a busca.
+        Retorna True apenas para a primeira resposta, as demais são contadas como duplicadas.
+        """
+        with self.lock:
+            self.responders.add(responder)
+            if self.resolved:
+                self.duplicate_responses += 1
+                return False
+
+            self.value = value
+            self.hop_count = hop_count
+            self.first_response_latency = time.monotonic() - self.started_at
+            return True
+
+
+class SearchSessions:
+    """Conjunto das buscas iniciadas pelo nó, indexadas pelo número de sequência."""
+
+    def __init__(self, max_sessions: int = 256) -> None:
+        """Inicializa o conjunto, mantendo no máximo max_sessions sessões."""
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict[int, SearchSession] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def start(self, sequence_number: int, mode: str, key: str, ttl: int) -> SearchSession:
+        """Cria uma sessão para uma nova busca, descartando a mais antiga se necessário."""
+        session = SearchSession(sequence_number, mode, key, ttl)
+        with self.lock:
+            self.sessions[sequence_number] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def retry(self, session: SearchSession, sequence_number: int, ttl: int) -> SearchSession:
+        """
+        Registra uma nova tentativa de session, enviada com outro número de sequência e TTL.
+        A sessão continua a mesma, então a latência da resposta conta desde a primeira tentativa.
+        """
+        with self.lock:
+            self.sessions.pop(session.sequence_number, None)
+            session.sequence_number = sequence_number
+            session.ttl = ttl
+            session.attempts += 1
+            self.sessions[sequence_number] = session
+        return session
+
+    def get(self, sequence_number: int) -> SearchSession | None:
+        """Retorna a sessão com o número de sequência dado, se existir."""
+        with self.lock:
+            return self.sessions.get(sequence_number)
+
+    def find(self, mode: str, key: str) -> SearchSession | None:
+        """
+        Retorna a sessão mais recente para (mode, key).
+        Mensagens VALUE não carregam o número de sequência da busca, então
+        sessões ainda pendentes têm prioridade sobre as já resolvidas.
+        """
+        with self.lock:
+            candidates = [s for s in reversed(self.sessions.values()) if s.mode == mode and s.key == key]
+        for session in candidates:
+            if not session.resolved:
+                return session
+        return candidates[0] if candidates else None
+
+    def duplicate_responses(self) -> int:
+        """Retorna o total de respostas duplicadas descartadas nas sessões mantidas."""
+        with self.lock:
+            return sum(session.duplicate_responses for session in self.sessions.values())
+
+    def outstanding(self) -> list[SearchSession]:
+        """Retorna as sessões que ainda não receberam resposta."""
+        with self.lock:
+            return [session for session in self.sessions.values() if not session.resolved]
+
+
+class AdaptiveTtl:
+    """
+    Escolhe o TTL das buscas iniciadas pelo nó a partir dos saltos das últimas buscas bem-sucedidas de cada modo:
+    o percentil dado dos saltos mais uma margem. Buscas sem resposta após timeout segundos são repetidas
+    com o dobro do TTL até max_retries vezes, a última já com o TTL padrão do nó.
+    """
+
+    def __init__(
+            self,
+            percentile: float = 95,
+            margin: int = 2,
+            timeout: float = 1.0,
+            max_retries: int = 2,
+            window: int = 100,
+            min_samples: int = 5
+    ) -> None:
+        """Inicializa sem saltos observados; até min_samples buscas de um modo, ele usa o TTL padrão."""
+        if not 0 < percentile <= 100:
+            raise ValueError(f"Percentil deve estar entre 0 e 100: {percentile}")
+        if margin < 0 or timeout <= 0 or max_retries < 0:
+            raise ValueError(
+                f"Margem, timeout e repetições do TTL adaptativo inválidos: {margin}, {timeout}, {max_retries}")
+
+        self.percentile = percentile
+        self.margin = margin
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.window = window
+        self.min_samples = min_samples
+
+        self.hop_counts: dict[str, deque[int]] = {}  # modo: saltos das últimas window buscas bem-sucedidas
+        self.retries: dict[str, int] = {}  # modo: buscas repetidas com TTL maior
+        self.exhausted: dict[str, int] = {}  # modo: buscas sem resposta mesmo com o TTL padrão
+        self.lock = threading.Lock()
+
+    def record(self, mode: str, hop_count: int) -> None:
+        """Registra os saltos de uma busca bem-sucedida."""
+        with self.lock:
+            if mode not in self.hop_counts:
+                self.hop_counts[mode] = deque(maxlen=self.window)
+            self.hop_counts[mode].append(hop_count)
+
+    def ttl(self, mode: str, default_ttl: int) -> int:
+        """Retorna o TTL da primeira tentativa de uma busca, nunca maior que default_ttl."""
+        with self.lock:
+            hop_counts = sorted(self.hop_counts.get(mode, ()))
+        if len(hop_counts) < self.min_samples:
+            return default_ttl
+
+        rank = math.ceil(self.percentile / 100 * len(hop_counts)) - 1
+        return min(default_ttl, hop_counts[rank] + self.margin)
+
+    def retry_ttl(self, ttl: int, retry: int, default_ttl: int) -> int:
+        """
+        Retorna o TTL da repetição retry (1 para a primeira) de uma busca que não teve resposta com ttl:
+        o dobro do anterior, ou o TTL padrão na última repetição permitida.
+        """
+        if retry >= self.max_retries:
+            return default_ttl
+        return min(default_ttl, ttl * 2)
+
+    def exhausted_retries(self, attempts: int, ttl: int, default_ttl: int) -> bool:
+        """Indica se uma busca sem resposta após attempts tentativas, a última com ttl, não deve ser repetida."""
+        return attempts > self.max_retries or ttl >= default_ttl
+
+    def count_retry(self, mode: str) -> None:
+        """Conta uma busca repetida com TTL maior."""
+        with self.lock:
+            self.retries[mode] = self.retries.get(mode, 0) + 1
+
+    def count_exhausted(self, mode: str) -> None:
+        """Conta uma busca que ficou sem resposta mesmo com o TTL padrão."""
+        with self.lock:
+            self.exhausted[mode] = self.exhausted.get(mode, 0) + 1
+
+    def to_dict(self, default_ttl: int) -> dict[str, dict[str, int]]:
+        """Retorna, para cada modo, o TTL atual, as amostras na janela, as repetições e as buscas esgotadas."""
+        with self.lock:
+            modes = sorted(set(self.hop_counts) | set(self.retries) | set(self.exhausted))
+            counts = {
+                mode: (len(self.hop_counts.get(mode, ())), self.retries.get(mode, 0), self.exhausted.get(mode, 0))
+                for mode in modes
+            }
+        return {
+            mode: {
+                "ttl": self.ttl(mode, default_ttl),
+                "samples": counts[mode][0],
+                "retries": counts[mode][1],
+                "exhausted": counts[mode][2],
+            }
+            for mode in modes
+        }
+
+
+class DepthFirstSearches:
+    """
+    Estado das buscas em profundidade que passaram pelo nó, indexado pela busca (origem, seqno).
+    Buscas simultâneas, ou uma repetição enviada enquanto a tentativa anterior ainda percorre a rede,
+    têm estados separados.
+    """
+
+    def __init__(self, max_searches: int = 1024) -> None:
+        """Inicializa o conjunto, mantendo o estado de no máximo max_searches buscas."""
+        self.max_searches = max_searches
+        self.searches: OrderedDict[tuple[str, int], dict[str, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, origin: str, sequence_number: int) -> dict[str, Any] | None:
+        """Retorna o estado da busca (origin, sequence_number), ou None se ela ainda não passou pelo nó."""
+        with self.lock:
+            state = self.searches.get((origin, sequence_number))
+            if state is not None:
+                self.searches.move_to_end((origin, sequence_number))
+            return state
+
+    def start(self, origin: str, sequence_number: int, no_mae: str, vizinhos_candidatos: list) -> dict[str, Any]:
+        """Cria o estado de uma busca que chegou ao nó pela primeira vez, descartando o mais antigo se necessário."""
+        state = {
+            "no_mae": no_mae,  # ip porta
+            "vizinho_ativo": None,  # socket
+            "vizinhos_candidatos": vizinhos_candidatos  # sockets
+        }
+        with self.lock:
+            self.searches[(origin, sequence_number)] = state
+            while len(self.searches) > self.max_searches:
+                self.searches.popitem(last=False)
+        return state
@@ -0,0 +1,309 @@
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+import node
+import utils
+import metrics
+import profiler
+from typing import Iterator, Optional
+
+
+class SharedAddressTable:
+    """
+    Dicionário ip:porta -> inteiro guardado em memória compartilhada entre processos.
+    O endereço é codificado em um inteiro de 48 bits (ip + porta), então não há colisões de chave;
+    as posições são encontradas por sondagem linear.
+    """
+
+    EMPTY = 0  # posição nunca usada
+    REMOVED = -1  # valor de uma chave removida
+
+    def __init__(self, capacity: int = 4096) -> None:
+        """Aloca a tabela com capacity posições."""
+        self.capacity = capacity
+        self.keys = multiprocessing.RawArray("q", capacity)
+        self.values = multiprocessing.RawArray("q", capacity)
+        self.lock = multiprocessing.Lock()
+
+    @staticmethod
+    def encode(address: str) -> int:
+        """Codifica ip:porta em um inteiro positivo."""
+        ip, port = utils.convert_str_to_ip_port(address)
+        return (int.from_bytes(socket.inet_aton(ip), "big") << 16 | port) + 1
+
+    @staticmethod
+    def decode(key: int) -> str:
+        """Decodifica um inteiro gerado por encode de volta para ip:porta."""
+        key -= 1
+        return f"{socket.inet_ntoa((key >> 16).to_bytes(4, 'big'))}:{key & 0xFFFF}"
+
+    def find_slot(self, key: int, insert: bool) -> int | None:
+        """Retorna a posição de key, ou a primeira posição livre se insert. Deve ser chamado com o lock."""
+        start = key % self.capacity
+        for offset in range(self.capacity):
+            slot = (start + offset) % self.capacity
+            if self.keys[slot] == key:
+                return slot
+            if self.keys[slot] == SharedAddressTable.EMPTY:
+                if not insert:
+                    return None
+                self.keys[slot] = key
+                self.values[slot] = SharedAddressTable.REMOVED
+                return slot
+
+        if insert:
+            raise ValueError(f"Tabela compartilhada cheia ({self.capacity} endereços)")
+        return None
+
+    def get(self, address: str) -> int | None:
+        """Retorna o valor de address, ou None se não estiver na tabela."""
+        with self.lock:
+            slot = self.find_slot(SharedAddressTable.encode(address), insert=False)
+            if slot is None or self.values[slot] == SharedAddressTable.REMOVED:
+                return None
+            return self.values[slot]
+
+    def __contains__(self, address: str) -> bool:
+        """Verifica se address está na tabela."""
+        return self.get(address) is not None
+
+    def __getitem__(self, address: str) -> int:
+        """Retorna o valor de address."""
+        value = self.get(address)
+        if value is None:
+            raise KeyError(address)
+        return value
+
+    def __setitem__(self, address: str, value: int) -> None:
+        """Define o valor de address."""
+        with self.lock:
+            self.values[self.find_slot(SharedAddressTable.encode(address), insert=True)] = value
+
+    def __delitem__(self, address: str) -> None:
+        """Remove address da tabela."""
+        with self.lock:
+            slot = self.find_slot(SharedAddressTable.encode(address), insert=False)
+            if slot is None or self.values[slot] == SharedAddressTable.REMOVED:
+                raise KeyError(address)
+            self.values[slot] = SharedAddressTable.REMOVED
+
+    def update_if_greater(self, address: str, value: int) -> bool:
+        """Define o valor de address se value for maior que o atual. Retorna se o valor foi alterado."""
+        with self.lock:
+            slot = self.find_slot(SharedAddressTable.encode(address), insert=True)
+            if self.values[slot] != SharedAddressTable.REMOVED and value <= self.values[slot]:
+                return False
+            self.values[slot] = value
+            return True
+
+    def addresses(self) -> Iterator[str]:
+        """Percorre os endereços presentes na tabela."""
+        with self.lock:
+            keys = [
+                self.keys[slot] for slot in range(self.capacity)
+                if self.keys[slot] != SharedAddressTable.EMPTY and self.values[slot] != SharedAddressTable.REMOVED
+            ]
+        return (SharedAddressTable.decode(key) for key in keys)
+
+
+class SharedState:
+    """Estado do nó lógico compartilhado entre os processos workers."""
+
+    def __init__(self) -> None:
+        """Aloca o estado compartilhado. Deve ser criado antes de iniciar os workers."""
+        self.sequence_number = multiprocessing.Value("q", 1)
+        self.last_seen_messages = SharedAddressTable()  # origem: último número de sequência visto
+        self.neighbors = SharedAddressTable(capacity=256)  # vizinho: 1
+        # Mensagens recebidas pelos outros workers que dependem do estado do primeiro: (mensagem, ip, porta)
+        self.primary_messages = multiprocessing.Queue()
+
+
+class ShardedNode(node.Node):
+    """
+    Worker de um nó lógico executado em vários processos que aceitam conexões na mesma porta (SO_REUSEPORT).
+    Número de sequência, mensagens vistas e a tabela de vizinhos são compartilhados entre os workers;
+    a tabela chave-valor é somente leitura e cada worker tem sua cópia.
+    Buscas são iniciadas apenas pelo primeiro worker, que tem o menu, e as mensagens que dependem do seu estado
+    (sessões de busca, buscas em profundidade, capacidades dos vizinhos e reorganização) são repassadas a ele.
+    """
+
+    # Operações processadas apenas pelo primeiro worker, além das buscas em profundidade
+    PRIMARY_OPERATIONS = frozenset({"HELLO", "BYE", "VAL", "UNLINK"})
+
+    def __init__(
+            self,
+            worker_index: int,
+            shared: SharedState,
+            ip: str,
+            port: int,
+            neighbors: Optional[list[tuple[str, int]]],
+            key_values: Optional[dict[str, str]],
+            node_metrics: Optional[metrics.Metrics] = None
+    ) -> None:
+        """Inicializa um worker do nó lógico ip:porta."""
+        self.worker_index = worker_index
+        self.shared = shared
+        super().__init__(ip, port, neighbors, key_values, node_metrics=node_metrics)
+
+        self.last_seen_messages = shared.last_seen_messages
+        for neighbor_ip, neighbor_port in self.neighbors:
+            shared.neighbors[f"{neighbor_ip}:{neighbor_port}"] = 1
+
+    @property
+    def sequence_number(self) -> int:
+        """Número de sequência do nó lógico, compartilhado entre os workers."""
+        return self.shared.sequence_number.value
+
+    @sequence_number.setter
+    def sequence_number(self, value: int) -> None:
+        """Ignora o valor inicial atribuído por Node.__init__: o número compartilhado é iniciado por SharedState."""
+
+    def next_sequence_number(self) -> int:
+        """Reserva o número de sequência de uma nova mensagem, lendo e incrementando o contador compartilhado."""
+        with self.shared.sequence_number.get_lock():
+            sequence_number = self.shared.sequence_number.value
+            self.shared.sequence_number.value += 1
+        return sequence_number
+
+    @staticmethod
+    def create_socket(ip: str, port: int) -> socket.socket:
+        """Cria um socket TCP IPv4 que divide a porta com os outros workers."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((ip, port))
+        return sock
+
+    @profiler.profiled("dedup")
+    def message_already_seen(self, message: str) -> bool:
+        """
+        Verifica se uma mensagem já foi vista por algum worker, marcando-a como vista.
+        Verificar e marcar de forma atômica impede que dois workers encaminhem a mesma mensagem.
+        """
+        parts = message.split(" ")
+        origin = parts[0]
+        sequence_number = int(parts[1])
+        return not self.last_seen_messages.update_if_greater(origin, sequence_number)
+
+    @staticmethod
+    def is_primary_message(message: str) -> bool:
+        """Verifica se uma mensagem deve ser processada pelo primeiro worker."""
+        parts = message.split(" ")
+        if len(parts) < 4:
+            return False
+        return parts[3] in ShardedNode.PRIMARY_OPERATIONS or (parts[3] == "SEARCH" and parts[4:5] == ["BP"])
+
+    def interpret_message(self, message: str, sender_ip: str, sender_port: int) -> None:
+        """Interpreta uma mensagem recebida, repassando ao primeiro worker as que dependem do estado dele."""
+        if self.worker_index != 0 and ShardedNode.is_primary_message(message):
+            self.shared.primary_messages.put((message, sender_ip, sender_port))
+            return
+        super().interpret_message(message, sender_ip=sender_ip, sender_port=sender_port)
+
+    def receive_primary_messages(self) -> None:
+        """Processa, no primeiro worker, as mensagens repassadas pelos demais."""
+        while True:
+            message, sender_ip, sender_port = self.shared.primary_messages.get()
+            try:
+                super().interpret_message(message, sender_ip=sender_ip, sender_port=sender_port)
+            except (ValueError, IndexError, KeyError) as error:
+                print(f"Erro ao processar mensagem repassada {message!r}: {error!r}")
+
+    def send_hello(self, peer: socket.socket) -> None:
+        """Envia um HELLO apenas pelo primeiro worker: para os vizinhos, os workers são um único nó."""
+        if self.worker_index == 0:
+            super().send_hello(peer)
+
+    def add_neighbor(self, ip: str, port: int) -> None:
+        """Adiciona um vizinho ao worker e o registra para os demais workers."""
+        super().add_neighbor(ip, port)
+        if (ip, port) in self.neighbors:
+            self.shared.neighbors[f"{ip}:{port}"] = 1
+
+    def delete_neighbor(self, ip: str, port: int) -> None:
+        """Deleta um vizinho do worker e dos demais workers."""
+        super().delete_neighbor(ip, port)
+        if f"{ip}:{port}" in self.shared.neighbors:
+            del self.shared.neighbors[f"{ip}:{port}"]
+
+    def synchronize_neighbors(self, interval: float = 1.0) -> None:
+        """Periodicamente conecta-se aos vizinhos adicionados e desconecta-se dos removidos por outros workers."""
+        while True:
+            time.sleep(interval)
+            shared_neighbors = {utils.convert_str_to_ip_port(address) for address in self.shared.neighbors.addresses()}
+            for ip, port in shared_neighbors - set(self.neighbors):
+                self.add_neighbor(ip, port)
+            for ip, port in set(self.neighbors) - shared_neighbors:
+                self.delete_neighbor(ip, port)
+
+
+def worker_arguments(args: argparse.Namespace, worker_index: int) -> argparse.Namespace:
+    """
+    Retorna os argumentos de um worker: métricas, trace e arquivo de pronto de cada worker são próprios,
+    e apenas o primeiro reorganiza os vizinhos e envia heartbeats.
+    """
+    worker_args = argparse.Namespace(**vars(args))
+    if worker_index != 0:
+        worker_args.rewire = None
+        worker_args.heartbeat = None
+    if args.metrics_port is not None:
+        worker_args.metrics_port = args.metrics_port + worker_index
+    if args.trace is not None:
+        worker_args.trace = f"{args.trace}.{worker_index}"
+    if args.ready_file is not None:
+        worker_args.ready_file = f"{args.ready_file}.{worker_index}"
+    return worker_args
+
+
+def start_worker(
+        worker_index: int,
+        shared: SharedState,
+        args: argparse.Namespace,
+        node_arguments: tuple
+) -> ShardedNode:
+    """Cria e configura um worker."""
+    worker_args = worker_arguments(args, worker_index)
+    node_metrics = None if worker_args.metrics_port is None else metrics.Metrics()
+    worker = ShardedNode(worker_index, shared, *node_arguments, node_metrics=node_metrics)
+    node.configure_node(worker, worker_args)
+    threading.Thread(target=worker.synchronize_neighbors, daemon=True).start()
+    if worker_index == 0:
+        threading.Thread(target=worker.receive_primary_messages, daemon=True).start()
+    return worker
+
+
+def run_worker(worker_index: int, shared: SharedState, args: argparse.Namespace, node_arguments: tuple) -> None:
+    """Executa um worker sem menu, apenas aceitando conexões."""
+    start_worker(worker_index, shared, args, node_arguments).receive_connections()
+
+
+def main() -> None:
+    """Inicia um nó lógico com --workers processos; o primeiro executa no processo atual, com o menu."""
+    parser = node.build_argument_parser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="número de processos que atendem a porta do nó (padrão: número de CPUs)"
+    )
+    args = parser.parse_args()
+
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("SO_REUSEPORT não é suportado neste sistema")
+
+    node_arguments = node.load_node_arguments(args)
+    shared = SharedState()
+
+    for worker_index in range(1, args.workers):
+        multiprocessing.Process(
+            target=run_worker,
+            args=(worker_index, shared, args, node_arguments),
+            daemon=True
+        ).start()
+
+    node.run(start_worker(0, shared, args, node_arguments))
+
+
+if __name__ == '__main__':
+    main()
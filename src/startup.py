@@ -0,0 +1,76 @@
+import time
+import contextlib
+import threading
+from typing import Any, Callable, Iterator
+
+
+class StartupTimeline:
+    """Tempo de cada etapa da inicialização do nó, contado a partir da criação do nó, e o sinal de pronto."""
+
+    def __init__(self) -> None:
+        """Inicia a contagem."""
+        self.started_at = time.monotonic()
+        self.phases: dict[str, float] = {}  # etapa: duração em milissegundos
+        self.events: dict[str, float] = {}  # evento: instante em milissegundos
+        self.counts: dict[str, int] = {}  # ex: chaves carregadas, vizinhos conectados
+        self.ready = threading.Event()
+        self.callbacks: list[Callable[["StartupTimeline"], None]] = []
+        self.lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Retorna o tempo desde a criação do nó, em milissegundos."""
+        return (time.monotonic() - self.started_at) * 1000
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Mede a duração de uma etapa, usado com a instrução with. Etapas podem executar em paralelo."""
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = (time.monotonic() - started_at) * 1000
+
+    def mark(self, event: str) -> None:
+        """Registra o instante da primeira ocorrência de um evento."""
+        with self.lock:
+            self.events.setdefault(event, self.elapsed())
+
+    def count(self, name: str, value: int) -> None:
+        """Registra uma quantidade, ex: chaves carregadas."""
+        with self.lock:
+            self.counts[name] = value
+
+    def mark_ready(self) -> None:
+        """Sinaliza que o nó está pronto e chama as funções registradas por on_ready."""
+        self.mark("pronto")
+        with self.lock:
+            callbacks, self.callbacks = self.callbacks, []
+        self.ready.set()
+        for callback in callbacks:
+            callback(self)
+
+    def on_ready(self, callback: Callable[["StartupTimeline"], None]) -> None:
+        """Registra uma função chamada quando o nó ficar pronto, ou a chama imediatamente se já estiver."""
+        with self.lock:
+            if not self.ready.is_set():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Retorna as etapas, os eventos e as quantidades da inicialização."""
+        with self.lock:
+            return {
+                "ready": self.ready.is_set(),
+                "phases_ms": dict(self.phases),
+                "events_ms": dict(self.events),
+                "counts": dict(self.counts),
+            }
+
+    def summary(self) -> str:
+        """Retorna uma linha com o tempo até o nó ficar pronto e a duração de cada etapa."""
+        timeline = self.to_dict()
+        phases = ", ".join(f"{name} {duration:.1f} ms" for name, duration in timeline["phases_ms"].items())
+        counts = ", ".join(f"{value} {name}" for name, value in timeline["counts"].items())
+        return f"Nó pronto em {timeline['events_ms'].get('pronto', self.elapsed()):.1f} ms ({phases}; {counts})"
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import threading
+import node
+from typing import Optional
+
+
+NODE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node.py")
+
+
+def write_key_values(file_path: str, num_keys: int) -> None:
+    """Gera um arquivo com num_keys pares chave-valor."""
+    with open(file_path, "w") as file:
+        for index in range(num_keys):
+            file.write(f"chave{index} valor{index}\n")
+
+
+def start_neighbors(num_neighbors: int, base_port: int) -> list[tuple[str, int]]:
+    """Inicia, neste processo, os vizinhos do nó medido e retorna seus endereços."""
+    addresses = []
+    for index in range(num_neighbors):
+        neighbor = node.Node("127.0.0.1", base_port + index, [], {})
+        threading.Thread(target=neighbor.receive_connections, daemon=True).start()
+        addresses.append(("127.0.0.1", base_port + index))
+    return addresses
+
+
+def first_ack(port: int, timeout: float) -> Optional[float]:
+    """
+    Tenta se conectar ao nó até conseguir, envia um PING e espera sua confirmação.
+    Retorna o instante da confirmação, ou None se o nó não responder dentro de timeout segundos.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+                sock.sendall(b"127.0.0.1:1 1 1 PING")
+                if sock.recv(1024).endswith(b"PING_OK"):
+                    return time.monotonic()
+        except OSError:
+            time.sleep(0.001)
+    return None
+
+
+def wait_for_file(file_path: str, timeout: float) -> Optional[float]:
+    """Espera o arquivo ser criado e retorna o instante em que foi encontrado, ou None após timeout segundos."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(file_path):
+            return time.monotonic()
+        time.sleep(0.001)
+    return None
+
+
+def run_node(
+        port: int,
+        neighbors_file: str,
+        key_values_file: str,
+        ready_file: str,
+        sync: bool,
+        timeout: float
+) -> dict[str, Optional[float]]:
+    """
+    Executa o nó em um processo separado e mede, a partir do início do processo,
+    o instante da primeira confirmação, o instante em que ficou pronto e a duração de cada etapa.
+    """
+    command = [sys.executable, NODE_SCRIPT, f"127.0.0.1:{port}", neighbors_file, key_values_file]
+    command += ["--ready-file", ready_file] + (["--sync-startup"] if sync else [])
+
+    started_at = time.monotonic()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    try:
+        acked_at = first_ack(port, timeout)
+        ready_at = wait_for_file(ready_file, timeout)
+        phases = {}
+        if ready_at is not None:
+            with open(ready_file) as file:
+                phases = json.load(file)["phases_ms"]
+    finally:
+        process.kill()
+        process.wait()
+
+    return {
+        "primeira confirmacao": None if acked_at is None else (acked_at - started_at) * 1000,
+        "pronto": None if ready_at is None else (ready_at - started_at) * 1000,
+        **{f"etapa {name}": duration for name, duration in phases.items()},
+    }
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Lê os argumentos passados na inicialização do programa."""
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo até o nó aceitar conexões e até carregar suas chaves, com e sem --sync-startup"
+    )
+    parser.add_argument("--chaves", type=int, default=200000, help="pares chave-valor do nó (padrão: 200000)")
+    parser.add_argument("--vizinhos", type=int, default=4, help="vizinhos do nó (padrão: 4)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções de cada modo (padrão: 3)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="espera máxima por execução (padrão: 30.0)")
+    parser.add_argument("--porta", type=int, default=7000, help="porta inicial dos nós (padrão: 7000)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Mede a inicialização em cada modo e imprime a média de cada medida, em milissegundos."""
+    args = parse_arguments()
+
+    with tempfile.TemporaryDirectory() as directory:
+        key_values_file = os.path.join(directory, "chave_valor.txt")
+        neighbors_file = os.path.join(directory, "vizinhos.txt")
+        write_key_values(key_values_file, args.chaves)
+
+        # Os vizinhos imprimem as mensagens recebidas de cada execução
+        with open(os.devnull, "w") as output, contextlib.redirect_stdout(output):
+            neighbors = start_neighbors(args.vizinhos, args.porta)
+            with open(neighbors_file, "w") as file:
+                file.write("\n".join(f"{ip}:{port}" for ip, port in neighbors) + "\n")
+
+            # Cada execução usa uma porta própria, depois das portas dos vizinhos
+            port = args.porta + args.vizinhos
+            results = {}
+            for mode, sync in (("sincrono", True), ("rapido", False)):
+                runs = []
+                for repetition in range(args.repeticoes):
+                    ready_file = os.path.join(directory, f"pronto_{mode}_{repetition}.json")
+                    runs.append(run_node(port, neighbors_file, key_values_file, ready_file, sync, args.timeout))
+                    port += 1
+                results[mode] = {
+                    metric: -1 if any(run.get(metric) is None for run in runs)
+                    else sum(run[metric] for run in runs) / len(runs)
+                    for metric in runs[0]
+                }
+
+    print(f"{args.chaves} chaves, {args.vizinhos} vizinhos, media de {args.repeticoes} execucoes (ms)")
+    for mode, result in results.items():
+        print(mode)
+        for metric, value in result.items():
+            print(f"    {metric:<22} {value:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
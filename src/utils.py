@@ -1,4 +1,4 @@
-import statistics
+from typing import Iterator
 
 
 def is_valid_ip(ip: str) -> bool:
@@ -34,12 +34,15 @@ def convert_str_to_ip_port(address: str) -> tuple[str, int]:
 
 def get_key_value_from_file(file_path: str) -> dict[str, str]:
     """Retorna um dicionario de chave-valor a partir de um arquivo."""
-    lines = get_lines_from_file(file_path)
-    data = {}
-    for line in lines:
-        key, value = line.split(" ")
-        data[key] = value
-    return data
+    return dict(iterate_key_values_from_file(file_path))
+
+
+def iterate_key_values_from_file(file_path: str) -> Iterator[tuple[str, str]]:
+    """Percorre os pares chave-valor de um arquivo à medida que são lidos, sem carregar o arquivo inteiro."""
+    with open(file_path, "r") as file:
+        for line in file:
+            key, value = line.rstrip("\r\n").split(" ")
+            yield key, value
 
 
 def get_all_neighbors_from_file(file_path: str) -> list[tuple[str, int]]:
@@ -54,19 +57,3 @@ def get_all_neighbors_from_file(file_path: str) -> list[tuple[str, int]]:
 
         neighbors.append((ip, port))
     return neighbors
-
-
-def calculate_mean(data: list):
-    """
-    Calcula a média
-    Se data é vazio, retorna -1
-    """
-    return -1 if len(data) == 0 else statistics.mean(data)
-
-
-def calculate_standard_deviation(data: list):
-    """
-    Calcula o desvio padrão
-    Se len(data) < 2, retorna -1.00
-    """
-    return -1.00 if len(data) < 2 else statistics.stdev(data)